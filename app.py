@@ -1,15 +1,56 @@
-import csv
 import json
+import logging
 import os
+import signal
+import threading
+import time
 from dotenv import load_dotenv
-from flask import Flask, render_template
+from charts import CHART_TYPES, ChartCache
+from flask import Flask, Response, g, jsonify, render_template, request, url_for
+from http_cache import compress_response, conditional
+from metrics import HTTP_RESPONSES, HTTP_SECONDS, REGISTRY, TEMPLATE_SECONDS
+from poster_cache import PosterCache
+from storage.istorage import SORT_FIELDS, to_number
+from storage.snapshot import SnapshotStore
+from storage.storage_binary import StorageBinary
+from storage.storage_csv import StorageCsv
+from storage.storage_json import StorageJson
+from storage.storage_jsonl import StorageJsonl
+from storage.storage_sqlite import StorageSqlite
 
 
 app = Flask(__name__)
 app.config['TEMPLATES_AUTO_RELOAD'] = True
+# Static files are referenced with their mtime (see static_url), so they can be cached for a year
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 365 * 24 * 60 * 60
+logger = logging.getLogger(__name__)
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    """Records the duration and status of every request for /metrics (registered first, so it runs last)."""
+    endpoint = request.endpoint or "unknown"  # The rule's name, so URLs with parameters don't add label values
+    started = g.get("request_started")
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    HTTP_RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+app.after_request(compress_response)
 
 CSV_PATH = "data/movies.csv"
 JSON_PATH = "data/movies.json"
+JSONL_PATH = "data/movies.jsonl"
+BINARY_PATH = "data/movies.bin"
+SQLITE_PATH = "data/movies.db"
+PAGE_SIZE = 60  # Movies per page on the index page and the default for /api/movies
+MAX_PAGE_SIZE = 500
 
 # Load environment variables from .env file (if any)
 load_dotenv()
@@ -29,46 +70,326 @@ def load_data_source():
 
 # Load data source from config.json first
 DATA_SOURCE = load_data_source()
-print(f"🔍 DATA_SOURCE set to: {DATA_SOURCE}")
+logger.info("DATA_SOURCE set to: %s", DATA_SOURCE)
 
 if DATA_SOURCE is None:
     DATA_SOURCE = os.getenv("MOVIE_DATA_SOURCE", "csv")  # Fallback to .env if not set in config.json
 
-def load_movies():
-    """Loads the movie data either from CSV or JSON."""
+
+def _config_state():
     try:
-        if DATA_SOURCE == "json":
-            with open(JSON_PATH, encoding="utf-8") as jsonfile:
-                movies = json.load(jsonfile)
-                print("Loaded movies from JSON:", movies)  # Debugging line to check the structure
-
-                if isinstance(movies, dict):  # Ensure it's in the expected format (dict)
-                    # Converting the dictionary into a list format for template rendering
-                    return [{"title": title, **data} for title, data in movies.items()]
-                else:
-                    print("Warning: JSON file is not in the expected format.")
-                    return []
-        else:  # Default: CSV
-            with open(CSV_PATH, newline="", encoding="utf-8") as csvfile:
-                reader = csv.DictReader(csvfile)
-                return list(reader)
-    except FileNotFoundError:
-        print(f"⚠ Error: File {CSV_PATH if DATA_SOURCE == 'csv' else JSON_PATH} not found.")
-        return []
-    except (IOError, json.JSONDecodeError) as e:
-        print(f"Error loading data: {e}.")
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+_config = {"state": _config_state()}
+
+# With MOVIE_SNAPSHOT_DIR set (see serve.py) the app serves the current read-only snapshot
+# published there instead of opening the data file itself
+SNAPSHOT_DIR = os.getenv("MOVIE_SNAPSHOT_DIR")
+snapshot_store = SnapshotStore(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+
+# The parsed catalog is kept in memory between requests and only rebuilt when the
+# storage reports a new data version (file mtime/size) or a reload is requested
+_catalog_lock = threading.Lock()
+_catalog = {"storage": None, "movie_grid": None, "version": None}
+
+# Poster thumbnails under static/posters, filled in the background when the catalog is loaded
+poster_cache = PosterCache()
+
+# Rendered charts, re-rendered only when the data version changes
+chart_cache = ChartCache()
+
+
+def open_source(data_source):
+    """Returns a new storage for the data source's file or None if the file doesn't exist."""
+    storage_class, path = {
+        "json": (StorageJson, JSON_PATH),
+        "jsonl": (StorageJsonl, JSONL_PATH),
+        "binary": (StorageBinary, BINARY_PATH),
+        "sqlite": (StorageSqlite, SQLITE_PATH),
+    }.get(data_source, (StorageCsv, CSV_PATH))
+    if not os.path.exists(path):
+        logger.warning("File %s not found.", path)
+        return None
+    return storage_class(path)
+
+
+def check_config():
+    """Re-reads DATA_SOURCE when config.json changed, so switching the data source needs no restart."""
+    global DATA_SOURCE
+    state = _config_state()
+    if state == _config["state"]:
+        return
+    _config["state"] = state
+    data_source = load_data_source()
+    if data_source != DATA_SOURCE:
+        logger.info("DATA_SOURCE changed to: %s", data_source)
+        DATA_SOURCE = data_source
+        reload_movies()
+
+
+def get_storage():
+    """
+    Returns the storage for DATA_SOURCE, created once and reused by all requests. In snapshot
+    mode it is the current snapshot, which changes when a new one is published.
+    """
+    if snapshot_store is not None:
+        return snapshot_store.open_current()
+    check_config()
+    with _catalog_lock:
+        if _catalog["storage"] is None:
+            _catalog["storage"] = open_source(DATA_SOURCE)
+        return _catalog["storage"]
+
+
+def reload_movies(*_):
+    """Drops the cached catalog so the next request reads the data file again (also bound to SIGHUP)."""
+    with _catalog_lock:
+        _catalog.update(storage=None, movie_grid=None, version=None)
+    if snapshot_store is not None:
+        snapshot_store.reset()
+    logger.info("Movie catalog reload requested.")
+
+
+def load_movies():
+    """Returns the movies as a list for template rendering, rebuilt only when the data changed."""
+    storage = get_storage()
+    if storage is None:
         return []
 
+    version = storage.data_version()
+    with _catalog_lock:
+        if _catalog["movie_grid"] is not None and version is not None and version == _catalog["version"]:
+            return _catalog["movie_grid"]
+
+    movies = storage.load_movies()
+    logger.debug("Loaded movies: %s", movies)  # Lazy formatting, the dump is only built at DEBUG level
+
+    # Converting the dictionary into a list format for template rendering
+    movie_grid = [{"title": title, **data} for title, data in movies.items()]
+    with _catalog_lock:
+        _catalog.update(movie_grid=movie_grid, version=version)
+    # Thumbnails of new posters are cached in the background, pages use them once they are there
+    if poster_cache.fetch_in_background(movie["poster_url"] for movie in movie_grid):
+        logger.info("Caching poster thumbnails in the background.")
+    return movie_grid
+
+
+if hasattr(signal, "SIGHUP"):
+    try:
+        signal.signal(signal.SIGHUP, reload_movies)
+    except ValueError:
+        pass  # Only possible in the main thread, e.g. not when imported by a threaded server
+
+
+def data_version():
+    """Version of everything the pages are rendered from, used for the ETag."""
+    storage = get_storage()
+    version = storage.data_version() if storage is not None else None
+    if version is None:
+        return None
+    template_path = os.path.join(app.root_path, app.template_folder, "index_template.html")
+    return DATA_SOURCE, version, os.path.getmtime(template_path), poster_cache.version()
+
+
+def stats_version():
+    """Version of the movie data alone, used for the ETag and cache key of charts."""
+    storage = get_storage()
+    version = storage.data_version() if storage is not None else None
+    return None if version is None else (DATA_SOURCE, version)
+
+
+def data_last_modified():
+    """Returns the newest mtime of the data file and its journal/WAL, used for Last-Modified."""
+    if snapshot_store is not None:
+        storage = get_storage()
+        return os.path.getmtime(storage.filename) if storage is not None else None
+    paths = {"json": JSON_PATH, "jsonl": JSONL_PATH, "binary": BINARY_PATH, "sqlite": SQLITE_PATH}
+    path = paths.get(DATA_SOURCE, CSV_PATH)
+    mtimes = [os.path.getmtime(file) for file in (path, path + ".journal", path + "-wal") if os.path.exists(file)]
+    return max(mtimes) if mtimes else None
+
+
+def thumbnail_url(poster_url):
+    """Returns the URL of the cached thumbnail of a poster or None. Thumbnail names are content hashes."""
+    thumbnail = poster_cache.thumbnail(poster_url)
+    return url_for('static', filename=thumbnail) if thumbnail else None
+
+
+@app.context_processor
+def static_helpers():
+    """
+    Provides static_url(), which adds the file's mtime so changed files bypass the browser cache,
+    and poster_src(), which prefers the local thumbnail of a movie's poster.
+    """
+    def static_url(filename):
+        version = int(os.path.getmtime(os.path.join(app.static_folder, filename)))
+        return url_for('static', filename=filename, v=version)
+
+    def poster_src(movie):
+        return thumbnail_url(movie["poster_url"]) or movie["poster_url"]
+    return {"static_url": static_url, "poster_src": poster_src}
+
+
+def parse_query(args):
+    """Reads paging, sorting and filter parameters from the query string. Raises ValueError on bad input."""
+    def number(name, number_type):
+        value = args.get(name)
+        if value in (None, ""):
+            return None
+        try:
+            return number_type(value)
+        except ValueError:
+            raise ValueError(f"Parameter '{name}' must be a number.")
+
+    query = {
+        "title": args.get("title") or None,
+        "min_rating": number("min_rating", float),
+        "year_from": number("year_from", int),
+        "year_to": number("year_to", int),
+        "sort": args.get("sort") or None,
+        "descending": args.get("order", "asc") == "desc",
+        "offset": number("offset", int) or 0,
+        "limit": number("limit", int),
+    }
+    if query["limit"] is None:
+        query["limit"] = PAGE_SIZE  # Only when missing, limit=0 is rejected below
+    if query["sort"] is not None and query["sort"] not in SORT_FIELDS:
+        raise ValueError(f"Parameter 'sort' must be one of {', '.join(SORT_FIELDS)}.")
+    if query["offset"] < 0 or not 0 < query["limit"] <= MAX_PAGE_SIZE:
+        raise ValueError(f"Parameter 'offset' must be >= 0 and 'limit' between 1 and {MAX_PAGE_SIZE}.")
+    return query
+
+
+def query_movies(query):
+    """
+    Returns (total, page) for the parsed query. Unfiltered, unsorted pages are sliced from
+    the cached movie grid, everything else (and every query on a snapshot) is answered by the storage.
+    """
+    filters = ("title", "min_rating", "year_from", "year_to", "sort")
+    if snapshot_store is None and all(query[name] is None for name in filters):
+        movie_grid = load_movies()
+        return len(movie_grid), movie_grid[query["offset"]:query["offset"] + query["limit"]]
+
+    storage = get_storage()
+    if storage is None:
+        return 0, []
+    total, page = storage.query_movies(**query)
+    return total, [{"title": title, **data} for title, data in page]
+
+
+def movie_to_json(movie):
+    """Returns the movie with numeric rating and year (CSV files store them as strings)."""
+    rating = to_number(movie["rating"])
+    year = to_number(movie["year"], int)
+    return {
+        "title": movie["title"],
+        "rating": rating if rating is not None else movie["rating"],
+        "year": year if year is not None else movie["year"],
+        "poster_url": movie["poster_url"],
+        "thumbnail_url": thumbnail_url(movie["poster_url"]),
+        "imdbID": movie["imdbID"],
+    }
+
+
 @app.route('/')
+@conditional(data_version, data_last_modified)
 def index():
-    """Route to render the movie grid on the homepage."""
+    """Route to render the first page of the movie grid, further pages are loaded from /api/movies."""
     title = "My Movie App"
-    movie_grid = load_movies()
-    print("Rendering movie grid:", movie_grid)  # Debugging line to check the data passed to template
-    return render_template('index_template.html', title=title, movie_grid=movie_grid)
+    try:
+        query = parse_query(request.args)
+    except ValueError:
+        query = parse_query({})
+    total, movie_grid = query_movies(query)
+    logger.debug("Rendering movie grid: %s", movie_grid)  # Debugging line to check the data passed to template
+    next_offset = query["offset"] + len(movie_grid)
+    with TEMPLATE_SECONDS.time(template="index_template.html"):
+        return render_template('index_template.html', title=title, movie_grid=movie_grid,
+                               next_offset=next_offset if next_offset < total else None, page_size=query["limit"])
+
+
+@app.route('/api/movies')
+@conditional(data_version, data_last_modified)
+def api_movies():
+    """
+    Returns one page of movies as JSON.
+
+    Query parameters: offset, limit, sort (title, rating or year), order (asc or desc),
+    title (substring), min_rating, year_from and year_to.
+    """
+    try:
+        query = parse_query(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    total, movies = query_movies(query)
+    next_offset = query["offset"] + len(movies)
+    return jsonify(
+        total=total,
+        offset=query["offset"],
+        limit=query["limit"],
+        next_offset=next_offset if next_offset < total else None,
+        movies=[movie_to_json(movie) for movie in movies],
+    )
+
+
+@app.route('/api/stats')
+@conditional(data_version, data_last_modified)
+def api_stats():
+    """Returns the rating statistics (average, median, percentiles, best/worst movies, per year) as JSON."""
+    storage = get_storage()
+    stats = storage.movie_stats() if storage is not None else None
+    if stats is None:
+        return jsonify(error="No valid ratings to analyze."), 404
+    return jsonify(stats)
+
+
+@app.route('/charts/ratings.<chart_format>')
+@conditional(stats_version, data_last_modified)
+def chart_ratings(chart_format):
+    """Returns the rating histogram as PNG or SVG, rendered once per data version."""
+    if chart_format not in CHART_TYPES:
+        return jsonify(error=f"Unknown chart format '{chart_format}', use one of {', '.join(CHART_TYPES)}."), 404
+    storage = get_storage()
+    data = chart_cache.get(storage, chart_format, stats_version()) if storage is not None else None
+    if data is None:
+        return jsonify(error="No valid ratings to create histogram."), 404
+    return Response(data, mimetype=CHART_TYPES[chart_format])
+
+
+@app.route('/metrics')
+def metrics():
+    """Returns the timings and counters of this process in the Prometheus text format."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/api/search')
+@conditional(data_version, data_last_modified)
+def api_search():
+    """
+    Returns movies matching the query parameter q, ranked and typo tolerant, as JSON.
+    With autocomplete=1 only the titles with a word starting with q are returned.
+    """
+    query = request.args.get("q", "").strip()
+    limit = request.args.get("limit", 10, type=int)
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        return jsonify(error=f"Parameter 'limit' must be between 1 and {MAX_PAGE_SIZE}."), 400
+
+    storage = get_storage()
+    if storage is None or not query:
+        return jsonify(query=query, titles=[]) if request.args.get("autocomplete") else jsonify(query=query, movies=[])
+    if request.args.get("autocomplete"):
+        return jsonify(query=query, titles=storage.autocomplete(query, limit))
+    return jsonify(query=query, movies=[{**movie_to_json({"title": title, **movie}), "score": round(score, 3)}
+                                        for title, movie, score in storage.rank_movies(query, limit)])
+
 
 # Load Flask secret key from .env file
 app.secret_key = os.getenv("FLASK_SECRET_KEY")
 
 if __name__ == '__main__':
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
     app.run(debug=True)
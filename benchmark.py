@@ -0,0 +1,289 @@
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from storage.storage_binary import StorageBinary, write_catalog
+from storage.storage_csv import StorageCsv
+from storage.storage_json import StorageJson
+from storage.storage_jsonl import StorageJsonl, write_movies
+from storage.storage_sqlite import StorageSqlite
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, the peak RSS is left out there
+    resource = None
+
+# Format -> (storage class, file extension)
+FORMATS = {
+    "csv": (StorageCsv, ".csv"),
+    "json": (StorageJson, ".json"),
+    "jsonl": (StorageJsonl, ".jsonl"),
+    "binary": (StorageBinary, ".bin"),
+    "sqlite": (StorageSqlite, ".db"),
+}
+DEFAULT_FORMATS = ("csv", "json")
+DEFAULT_SIZES = (1000, 10000, 100000)
+MUTATIONS = 50  # Movies added, updated and deleted one at a time
+BATCH_SIZE = 100  # Movies added with one add_movies() call
+QUERIES = ("silent river", "silnt rivr", "golden", "night 42", "the last empire")
+WEB_ROUTES = (
+    "/",
+    "/api/movies?limit=60",
+    "/api/movies?sort=rating&order=desc&limit=60",
+    "/api/movies?title=river&min_rating=7",
+    "/api/search?q=silnt+rivr",
+    "/api/stats",
+    "/charts/ratings.png",
+)
+SLOWER_THRESHOLD = 1.2  # Reported as a regression when 20% slower than the baseline
+
+ADJECTIVES = ("Silent", "Golden", "Dark", "Last", "Broken", "Hidden", "Crimson", "Lost", "Eternal", "Wild")
+NOUNS = ("River", "Night", "Empire", "Garden", "Storm", "Shadow", "Kingdom", "Dream", "Mirror", "Road")
+
+
+def generate_catalog(size, seed=0):
+    """
+    Yields size synthetic (title, movie) tuples, the same ones for the same seed.
+
+    About 2% of the ratings are 'N/A' like in real OMDb data. Posters are the OMDb placeholder,
+    so neither the web app nor the site generator starts downloading thumbnails.
+    """
+    generator = random.Random(seed)
+    for number in range(size):
+        title = f"{'The ' if generator.random() < 0.3 else ''}{generator.choice(ADJECTIVES)} " \
+                f"{generator.choice(NOUNS)} {number}"
+        rating = round(generator.uniform(1.0, 9.9), 1) if generator.random() > 0.02 else "N/A"
+        yield title, {"rating": rating, "year": generator.randint(1920, 2025),
+                      "poster_url": "No poster available", "imdbID": f"tt{number:07d}"}
+
+
+def write_benchmark_catalog(storage_format, path, movies):
+    """Writes (title, movie) tuples in the layout the storage of storage_format reads."""
+    if storage_format == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["title", "rating", "year", "poster_url", "imdbID"])
+            for title, movie in movies:
+                writer.writerow([title, movie["rating"], movie["year"], movie["poster_url"], movie["imdbID"]])
+    elif storage_format == "json":
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(dict(movies), file, indent=4)
+    elif storage_format == "jsonl":
+        write_movies(path, movies)
+    elif storage_format == "binary":
+        write_catalog(path, movies)
+    else:
+        StorageSqlite(path).import_movies(movies)
+
+
+class Recorder:
+    """Times operations of one benchmark case and collects the results as dictionaries."""
+
+    def __init__(self, case, trace_memory=False):
+        self.case = case
+        self.trace_memory = trace_memory
+        self.results = []
+
+    def measure(self, operation, function, repeat=1):
+        """
+        Calls function(i) for i in range(repeat), with its output discarded, and records the
+        seconds per call (and the peak of traced allocations with trace_memory). Returns the
+        result of the last call.
+        """
+        if self.trace_memory:
+            tracemalloc.start()
+        with redirect_stdout(io.StringIO()):  # The storages print a line per change
+            started = time.perf_counter()
+            for index in range(repeat):
+                result = function(index)
+            seconds = (time.perf_counter() - started) / repeat
+        entry = {**self.case, "operation": operation, "seconds": seconds, "repeat": repeat}
+        if self.trace_memory:
+            entry["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.results.append(entry)
+        return result
+
+
+def benchmark_storage(recorder, storage_class, path):
+    """Times the storage operations. Mutations come last, as they change the catalog."""
+    storage = storage_class(path)
+    recorder.measure("load", lambda _: storage.load_movies())
+    recorder.measure("load_cached", lambda _: storage.load_movies(), repeat=100)
+    recorder.measure("iter_cold", lambda _: sum(1 for _ in storage_class(path).iter_movies()))
+    recorder.measure("count_cold", lambda _: storage_class(path).count_movies())
+    recorder.measure("search_first", lambda _: storage.rank_movies(QUERIES[0], 10))
+    recorder.measure("search", lambda i: storage.rank_movies(QUERIES[i % len(QUERIES)], 10), repeat=50)
+    recorder.measure("search_substring", lambda _: storage.search_movies("river"))
+    recorder.measure("sort_first", lambda _: storage.sorted_movies("rating", descending=True, limit=10))
+    recorder.measure("sort", lambda i: storage.sorted_movies(("rating", "year", "title")[i % 3], limit=10),
+                     repeat=50)
+    recorder.measure("stats_cold", lambda _: storage_class(path).movie_stats())
+    recorder.measure("stats", lambda _: storage.movie_stats(), repeat=10)
+
+    recorder.measure("add", lambda i: storage.add_movie(f"Benchmark Movie {i}", 7.5, 2001, "No poster available",
+                                                        f"tb{i:07d}"), repeat=MUTATIONS)
+    recorder.measure("add_batch", lambda _: storage.add_movies([
+        {"title": f"Benchmark Batch {i}", "rating": 6.5, "year": 2002, "poster_url": "No poster available",
+         "imdbID": f"tc{i:07d}"} for i in range(BATCH_SIZE)]))
+    recorder.measure("update", lambda i: storage.update_movie(f"Benchmark Movie {i}", 8.0, "No poster available"),
+                     repeat=MUTATIONS)
+    recorder.measure("update_batch", lambda _: storage.update_movies(
+        {f"Benchmark Batch {i}": {"rating": 5.5} for i in range(BATCH_SIZE)}))
+    recorder.measure("delete", lambda i: storage.delete_movie(f"Benchmark Movie {i}"), repeat=MUTATIONS)
+    if hasattr(storage, "compact"):
+        recorder.measure("compact", lambda _: storage.compact())
+    return storage
+
+
+def benchmark_cli(recorder, storage, directory):
+    """Times MovieApp commands and the static site generation on the same storage."""
+    from movie_app import MovieApp
+    from site_generator import TEMPLATE_DIR, SiteGenerator
+
+    movie_app = MovieApp(data_source="csv", storage=storage)  # The data source isn't used with a storage
+    recorder.measure("cli_list", lambda _: movie_app.list_movies())
+    recorder.measure("cli_list_top", lambda _: movie_app.list_movies(limit=20, sort="rating", descending=True))
+    recorder.measure("cli_search", lambda _: movie_app.search_movies(QUERIES[1]))
+    recorder.measure("cli_stats", lambda _: movie_app.show_stats())
+
+    site_dir = os.path.join(directory, "site")
+    os.makedirs(site_dir)
+    generator = SiteGenerator(template_dir=TEMPLATE_DIR, output_dir=site_dir)
+    recorder.measure("site", lambda _: generator.generate(storage.iter_movies(), storage.count_movies()))
+    recorder.measure("site_unchanged", lambda _: generator.generate(storage.iter_movies(), storage.count_movies()))
+
+
+def benchmark_web(recorder, storage, storage_format, requests_per_route):
+    """Measures the Flask routes through the test client, reported as seconds and requests per second."""
+    import app as web
+
+    web.DATA_SOURCE = storage_format
+    with web._catalog_lock:
+        web._catalog.update(storage=storage, movie_grid=None, version=None)
+    client = web.app.test_client()
+    recorder.measure("web_first_request", lambda _: client.get("/"))
+    for route in WEB_ROUTES:
+        client.get(route)  # Warms up the route's lazy imports, indexes and caches
+        recorder.measure(f"web {route}", lambda _: client.get(route), repeat=requests_per_route)
+    etag = client.get("/").headers.get("ETag")
+    recorder.measure("web / (304)", lambda _: client.get("/", headers={"If-None-Match": etag}),
+                     repeat=requests_per_route)
+    for entry in recorder.results:
+        if entry["operation"].startswith("web") and entry["seconds"]:
+            entry["requests_per_second"] = 1 / entry["seconds"]
+
+
+def run_case(storage_format, size, seed=0, trace_memory=False, web=True, requests_per_route=50):
+    """Runs all benchmarks for one format and catalog size in a temporary directory."""
+    storage_class, extension = FORMATS[storage_format]
+    recorder = Recorder({"format": storage_format, "size": size}, trace_memory)
+    with tempfile.TemporaryDirectory(prefix="movie-benchmark-") as directory:
+        path = os.path.join(directory, "movies" + extension)
+        recorder.measure("write", lambda _: write_benchmark_catalog(storage_format, path, generate_catalog(size, seed)))
+        recorder.results[-1]["file_bytes"] = os.path.getsize(path)
+        storage = benchmark_storage(recorder, storage_class, path)
+        benchmark_cli(recorder, storage, directory)
+        if web:
+            benchmark_web(recorder, storage, storage_format, requests_per_route)
+    if resource is not None:
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        recorder.results.append({**recorder.case, "operation": "max_rss",
+                                 "bytes": max_rss if sys.platform == "darwin" else max_rss * 1024})
+    return recorder.results
+
+
+def run_benchmarks(formats=DEFAULT_FORMATS, sizes=DEFAULT_SIZES, seed=0, trace_memory=False, web=True,
+                   requests_per_route=50):
+    """
+    Runs every format/size case in a fresh process, so cold loads are really cold and the
+    peak RSS belongs to that case. Returns the results document (see main).
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for size in sizes:
+        for storage_format in formats:
+            print(f"Benchmarking {storage_format} with {size} movies...", file=sys.stderr)
+            with context.Pool(1) as pool:
+                results += pool.apply(run_case, (storage_format, size, seed, trace_memory, web, requests_per_route))
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "trace_memory": trace_memory,
+        "results": results,
+    }
+
+
+def print_results(document, baseline=None):
+    """Prints a table of the results, with the change against a baseline document if given."""
+    previous = {}
+    if baseline:
+        previous = {(entry["format"], entry["size"], entry["operation"]): entry
+                    for entry in baseline["results"] if "seconds" in entry}
+    for entry in document["results"]:
+        label = f"{entry['format']:>6} {entry['size']:>8} {entry['operation']:<48}"
+        if "seconds" not in entry:
+            print(f"{label} {entry['bytes'] / 2 ** 20:10.1f} MB peak RSS")
+            continue
+        line = f"{label} {entry['seconds'] * 1000:10.3f} ms"
+        if "requests_per_second" in entry:
+            line += f" {entry['requests_per_second']:9.0f} req/s"
+        if "peak_bytes" in entry:
+            line += f" {entry['peak_bytes'] / 2 ** 20:9.1f} MB"
+        old = previous.get((entry["format"], entry["size"], entry["operation"]))
+        if old and old["seconds"]:
+            ratio = entry["seconds"] / old["seconds"]
+            line += f"  {ratio:5.2f}x" + ("  SLOWER" if ratio > SLOWER_THRESHOLD else "")
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the storages, CLI commands and web routes "
+                                                 "on synthetic catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="catalog sizes (default: 1000 10000 100000, up to 1000000 works)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=DEFAULT_FORMATS,
+                        help="storage formats (default: csv json)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic catalogs")
+    parser.add_argument("--memory", action="store_true",
+                        help="record the peak of traced allocations per operation (slows everything down)")
+    parser.add_argument("--no-web", action="store_true", help="skip the Flask routes")
+    parser.add_argument("--requests", type=int, default=50, help="requests per web route (default 50)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding="utf-8") as file:
+                baseline = json.load(file)
+        except (IOError, json.JSONDecodeError) as e:
+            print(f"Error reading baseline {args.baseline}: {e}")
+            return 1
+
+    document = run_benchmarks(args.formats, args.sizes, args.seed, args.memory, not args.no_web, args.requests)
+    print_results(document, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+        print(f"Results written to {args.output}.")
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py --sizes 1000 100000 --formats csv json --output results.json
+    sys.exit(main())
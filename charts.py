@@ -0,0 +1,100 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from metrics import CACHE_HITS, CACHE_MISSES
+from storage.istorage import HISTOGRAM_BINS, RATING_RANGE
+from storage.safe_io import atomic_write
+
+CHART_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+CHART_SIZE = (8, 5)  # Inches
+CHART_DPI = 100
+
+
+def render_rating_histogram(histogram, chart_format="png"):
+    """
+    Renders the rating histogram (counts per fixed-width bin over RATING_RANGE, as in
+    movie_stats()) and returns the PNG or SVG bytes.
+
+    The figure is drawn with matplotlib's Figure API instead of pyplot, so no display and no
+    global pyplot state are needed and the web app's threads can render at the same time.
+    """
+    from matplotlib.figure import Figure  # Slow to import, only needed when a chart is rendered
+
+    low, high = RATING_RANGE
+    edges = [low + (high - low) * i / HISTOGRAM_BINS for i in range(HISTOGRAM_BINS + 1)]
+    figure = Figure(figsize=CHART_SIZE, dpi=CHART_DPI)
+    axes = figure.subplots()
+    axes.stairs(histogram, edges, fill=True, edgecolor="black")
+    axes.set_title("Movie Rating Distribution")
+    axes.set_xlabel("Rating")
+    axes.set_ylabel("Frequency")
+    output = io.BytesIO()
+    # Without the creation date the same data always gives the same bytes
+    figure.savefig(output, format=chart_format, metadata={"Date": None} if chart_format == "svg" else None)
+    return output.getvalue()
+
+
+def render_chart(storage, chart_format="png"):
+    """
+    Renders the rating histogram of a storage or returns None if there are no valid ratings.
+    The bin counts come from movie_stats(), so the catalog isn't loaded when the storage
+    has up-to-date statistics and movies without a numeric rating are left out.
+    """
+    if chart_format not in CHART_TYPES:
+        raise ValueError(f"Unknown chart format '{chart_format}', use one of {', '.join(CHART_TYPES)}.")
+    stats = storage.movie_stats()
+    if stats is None:
+        return None
+    return render_rating_histogram(stats["histogram"], chart_format)
+
+
+def write_chart(storage, path):
+    """Writes the rating histogram to path, the format (PNG or SVG) is taken from the extension. Returns True on success."""
+    chart_format = os.path.splitext(path)[1].lstrip(".").lower()
+    if chart_format not in CHART_TYPES:
+        print(f"Unknown chart format '{chart_format}', use a .png or .svg file.")
+        return False
+    data = render_chart(storage, chart_format)
+    if data is None:
+        print("No valid ratings to create histogram.")
+        return False
+    try:
+        with atomic_write(path, "wb") as file:
+            file.write(data)
+    except IOError as e:
+        print(f"Error writing chart to {path}: {e}")
+        return False
+    print(f"Histogram saved to {path}.")
+    return True
+
+
+class ChartCache:
+    """
+    Rendered charts keyed by format and data version, so a chart is rendered once per change
+    of the data instead of on every view. The least recently used charts are dropped once
+    more than max_entries are kept.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._charts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, storage, chart_format="png", version=None):
+        """Returns the chart bytes (or None without valid ratings). version=None renders without caching."""
+        if version is None:
+            return render_chart(storage, chart_format)
+        key = (chart_format, version)
+        with self._lock:
+            if key in self._charts:
+                self._charts.move_to_end(key)
+                CACHE_HITS.inc(cache="chart")
+                return self._charts[key]
+        CACHE_MISSES.inc(cache="chart")
+        data = render_chart(storage, chart_format)  # Rendered outside the lock, a rare duplicate render is harmless
+        with self._lock:
+            self._charts[key] = data
+            while len(self._charts) > self.max_entries:
+                self._charts.popitem(last=False)
+        return data
@@ -0,0 +1,69 @@
+import gzip
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import make_response, request
+from metrics import CACHE_HITS, CACHE_MISSES
+
+COMPRESSIBLE_TYPES = {"text/html", "text/css", "text/plain", "application/json", "application/javascript",
+                      "image/svg+xml"}
+MIN_COMPRESS_SIZE = 1024  # Smaller responses are not worth the CPU time
+COMPRESS_LEVEL = 6
+
+
+def conditional(get_version, get_last_modified=None):
+    """
+    Decorator for views whose output only depends on the request URL and a data version.
+
+    get_version() returns a hashable version of the data (or None to disable caching), the
+    ETag is derived from it and the URL. Clients sending a matching If-None-Match (or an
+    If-Modified-Since not older than get_last_modified(), a unix timestamp) get a 304
+    without the view being called.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = get_version()
+            if version is None:
+                return view(*args, **kwargs)
+
+            etag = hashlib.sha1(repr((version, request.full_path)).encode("utf-8")).hexdigest()
+            last_modified = get_last_modified() if get_last_modified else None
+            if last_modified is not None:
+                last_modified = datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (last_modified is not None and request.if_modified_since is not None
+                                and last_modified <= request.if_modified_since)
+
+            (CACHE_HITS if not_modified else CACHE_MISSES).inc(cache="http")
+            response = make_response("", 304) if not_modified else make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)  # Weak, so it stays valid for the gzipped body
+                if last_modified is not None:
+                    response.last_modified = last_modified
+                response.headers["Cache-Control"] = "no-cache"  # Always revalidate, it's cheap now
+            return response
+        return wrapper
+    return decorator
+
+
+def compress_response(response):
+    """after_request hook that gzips large text responses for clients accepting gzip."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or "gzip" not in request.headers.get("Accept-Encoding", "").lower()):
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
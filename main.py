@@ -1,13 +1,101 @@
+import argparse
 import logging
-from movie_app import MovieApp
+import sys
+from contextlib import nullcontext
+from config import load_data_source
+from metrics import REGISTRY, profiled
+from movie_app import DATA_SOURCES, HISTOGRAM_FILE, SEARCH_LIMIT, MovieApp
+from storage.istorage import SORT_FIELDS
 
-def main():
+
+def build_parser():
+    """Returns the parser for the scripted commands. Without a command the interactive menu starts."""
+    parser = argparse.ArgumentParser(description="Movie database. Run without a command for the interactive menu.")
+    parser.add_argument("--source", choices=DATA_SOURCES,
+                        help="storage to use (default: the one saved in config/config.json)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run under cProfile and print the slowest functions to stderr")
+    parser.add_argument("--profile-output", metavar="FILE", help="run under cProfile and write the stats to FILE")
+    parser.add_argument("--metrics", action="store_true",
+                        help="print the timings and counters (Prometheus format) to stderr when done")
+    commands = parser.add_subparsers(dest="command")
+
+    list_parser = commands.add_parser("list", help="list the movies")
+    list_parser.add_argument("--limit", type=int, help="show at most this many movies")
+    list_parser.add_argument("--sort", choices=SORT_FIELDS, help="sort by this field")
+    list_parser.add_argument("--desc", action="store_true", help="sort in descending order")
+
+    search_parser = commands.add_parser("search", help="search movies by title (typo tolerant)")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=SEARCH_LIMIT,
+                               help=f"show at most this many matches (default {SEARCH_LIMIT})")
+
+    stats_parser = commands.add_parser("stats", help="show rating statistics")
+    stats_parser.add_argument("--json", action="store_true", help="print the statistics as JSON")
+
+    add_parser = commands.add_parser("add", help="add movies from OMDb by title or IMDb ID")
+    add_parser.add_argument("titles", nargs="*", help="movie titles")
+    add_parser.add_argument("--imdb-id", action="append", default=[], help="IMDb ID, e.g. tt0133093 (repeatable)")
+    add_parser.add_argument("--file", help="file with one title or IMDb ID per line ('-' for stdin)")
+
+    chart_parser = commands.add_parser("chart", help="save the rating histogram as PNG or SVG")
+    chart_parser.add_argument("--output", default=HISTOGRAM_FILE, help=f"output file (default {HISTOGRAM_FILE})")
+
+    refresh_parser = commands.add_parser("refresh", help="re-sync ratings from OMDb")
+    refresh_parser.add_argument("--force", action="store_true", help="ignore cached OMDb answers")
+    return parser
+
+
+def run_command(app, args):
+    """Runs a scripted command and returns the exit code."""
+    if args.command == "list":
+        app.list_movies(limit=args.limit, sort=args.sort, descending=args.desc)
+    elif args.command == "search":
+        app.search_movies(args.query, limit=args.limit)
+    elif args.command == "stats":
+        app.show_stats(as_json=args.json)
+    elif args.command == "add":
+        queries = args.titles + args.imdb_id
+        if args.file == "-":
+            queries += sys.stdin.read().splitlines()
+        elif args.file:
+            try:
+                with open(args.file, encoding="utf-8") as file:
+                    queries += file.read().splitlines()
+            except IOError as e:
+                print(f"Error reading {args.file}: {e}")
+                return 1
+        if len(queries) == 1:
+            return 0 if app.add_movie(queries[0]) else 1
+        return 0 if app.bulk_add_movies(queries) else 1
+    elif args.command == "chart":
+        return 0 if app.create_histogram(args.output) else 1
+    elif args.command == "refresh":
+        report = app.refresh_ratings(force=args.force)
+        return 1 if report["errors"] else 0
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO)  # Logging
     try:
-        logging.basicConfig(level=logging.INFO)  # Logging
-        movie_app = MovieApp()
-        movie_app.run()
+        profiling = args.profile or args.profile_output
+        with profiled(args.profile_output) if profiling else nullcontext():
+            if args.command is None:
+                movie_app = MovieApp(data_source=args.source)
+                movie_app.run()
+                return 0
+            # Scripted commands don't ask for the data source, they use --source or the saved one
+            movie_app = MovieApp(data_source=args.source or load_data_source())
+            return run_command(movie_app, args)
     except Exception as e:
         logging.error(f"An error occurred: {e}")
+        return 1
+    finally:
+        if args.metrics:
+            print(REGISTRY.render(), end="", file=sys.stderr)
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
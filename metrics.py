@@ -0,0 +1,220 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets, from cached lookups to full parses
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _key(labels):
+    """Label dictionary -> hashable key with the labels in name order."""
+    return tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items())
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Registry:
+    """Holds the metrics of this process and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Returns all metrics as Prometheus text exposition (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines += metric.samples()
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    """A value per label set that only goes up, e.g. bytes read or cache hits."""
+    type = "counter"
+
+    def __init__(self, name, help_text, registry=REGISTRY):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values = {}  # Sorted label tuples -> value
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(labels)} {value}" for labels, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Counts observations (e.g. seconds) in cumulative buckets per label set, with their sum and count."""
+    type = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}  # Sorted label tuples -> [count per bucket..., count above the last bucket, sum, count]
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        self._observe(_key(labels), value)
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)  # Bucket counts are made cumulative in samples()
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the seconds the block took, also when it raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        entry = self._values.get(_key(labels))
+        return entry[-1] if entry else 0
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            for labels, entry in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, entry):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels, [('le', '+Inf')])} {entry[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {entry[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {entry[-1]}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+STORAGE_SECONDS = Histogram("movie_storage_operation_seconds", "Time spent in storage methods.")
+STORAGE_ERRORS = Counter("movie_storage_errors_total", "Storage methods that raised or failed to write.")
+BYTES_READ = Counter("movie_storage_bytes_read_total", "Bytes of data files and journals read.")
+BYTES_WRITTEN = Counter("movie_storage_bytes_written_total", "Bytes of data files and journals written.")
+FILE_PARSES = Counter("movie_storage_file_parses_total",
+                      "Passes over a data file, mode is load (whole catalog) or stream (iter_movies).")
+CACHE_HITS = Counter("movie_cache_hits_total", "Lookups answered from a cache.")
+CACHE_MISSES = Counter("movie_cache_misses_total", "Lookups a cache could not answer.")
+OMDB_SECONDS = Histogram("movie_omdb_request_seconds", "Latency of OMDb API requests, including failed ones.")
+OMDB_ERRORS = Counter("movie_omdb_errors_total",
+                      "Failed OMDb requests, reason is connection, status, rate_limit, invalid_response "
+                      "or api (e.g. 'Movie not found!').")
+TEMPLATE_SECONDS = Histogram("movie_template_render_seconds", "Time spent rendering templates.")
+HTTP_SECONDS = Histogram("movie_http_request_seconds", "Time spent handling HTTP requests.")
+HTTP_RESPONSES = Counter("movie_http_responses_total", "HTTP responses by endpoint and status code.")
+
+_active = threading.local()  # Instrumented calls running in this thread, see timed_method
+
+
+def timed_method(method, operation):
+    """
+    Wraps a storage method so its duration goes to STORAGE_SECONDS (labels storage and
+    operation) and exceptions to STORAGE_ERRORS. A call nested in the same method of the same
+    object (e.g. an override calling super()) is only measured once. Generators are measured
+    from the call until the iteration ends, which includes the caller's work between items;
+    timing every item would slow down streaming a large catalog noticeably.
+    """
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(self, *args, **kwargs):
+            key = (("operation", operation), ("storage", type(self).__name__))
+            started = time.perf_counter()
+            try:
+                yield from method(self, *args, **kwargs)
+            except Exception:
+                STORAGE_ERRORS.inc(storage=type(self).__name__, operation=operation)
+                raise
+            finally:
+                STORAGE_SECONDS._observe(key, time.perf_counter() - started)
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        calls = _active.__dict__.setdefault("calls", set())
+        call = (id(self), operation)
+        if call in calls:
+            return method(self, *args, **kwargs)
+        calls.add(call)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        except Exception:
+            STORAGE_ERRORS.inc(storage=type(self).__name__, operation=operation)
+            raise
+        finally:
+            calls.discard(call)
+            STORAGE_SECONDS._observe((("operation", operation), ("storage", type(self).__name__)),
+                                     time.perf_counter() - started)
+    return wrapper
+
+
+@contextmanager
+def profiled(output=None, limit=30):
+    """
+    Runs the block under cProfile (opt-in, e.g. main.py --profile). The stats are written to
+    output (for snakeviz or pstats) or the slowest functions by cumulative time are printed.
+    """
+    import cProfile
+    import pstats
+    import sys
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output:
+            profiler.dump_stats(output)
+            print(f"Profile written to {output}.", file=sys.stderr)
+        else:
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(limit)
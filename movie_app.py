@@ -1,50 +1,117 @@
+import json
 import random
-import matplotlib.pyplot as plt
-import requests
 import os
+from itertools import islice
 from dotenv import load_dotenv
+from storage.istorage import SORT_FIELDS, to_number
+from storage.storage_binary import StorageBinary, convert
 from storage.storage_csv import StorageCsv
 from storage.storage_json import StorageJson
+from storage.storage_jsonl import StorageJsonl, export_movies
+from storage.storage_sqlite import StorageSqlite, migrate
 from config import load_data_source, save_data_source, BASE_DIR
 
 load_dotenv()
 
+SEARCH_LIMIT = 20  # Maximum number of search results shown
+SORT_PAGE_SIZE = 20  # Movies shown per page when sorting
+HISTOGRAM_FILE = "ratings.png"
+DATA_SOURCES = ("csv", "json", "jsonl", "sqlite", "binary")
+
 class MovieApp:
-    def __init__(self):
+    def __init__(self, data_source=None, storage=None):
+        """
+        Without a data_source the user is asked for one and the choice is saved to config.json.
+        Scripted commands pass it in, so nothing is asked and config.json stays as it is.
+        The OMDb client and the storage are created on first use, keeping startup fast,
+        unless a storage object is passed in (e.g. by the benchmarks).
+        """
         self.api_key = os.getenv("OMDB_API_KEY")  # Load API key from .env
-        self.ask_user_for_data_source()
-        # If no valid selection was made, ask the user
-        if self.data_source not in ['csv', 'json']:
-            self.ask_for_data_source()
-        if not self.api_key:
-            print("API key missing!")
-            return
-        self._storage = self.get_storage_object()  # Choose the storage system (CSV/JSON)
-        self.movies = self._storage.load_movies()
+        self._omdb_client = None
+        self._storage_object = storage
+        if data_source is None:
+            self.ask_user_for_data_source()
+            if not self.api_key:
+                print("API key missing!")
+        elif data_source in DATA_SOURCES:
+            self.data_source = data_source
+        else:
+            raise ValueError(f"Unknown data source '{data_source}', use one of {', '.join(DATA_SOURCES)}.")
+
+    @property
+    def _omdb(self):
+        """The OMDb client, reusing one pooled HTTP session and answering repeated lookups from disk."""
+        if self._omdb_client is None:
+            from omdb_cache import OmdbCache
+            from omdb_client import OmdbClient  # Imports requests, only needed by the OMDb commands
+            self._omdb_client = OmdbClient(self.api_key,
+                                           cache=OmdbCache(os.path.join(BASE_DIR, "data", "omdb_cache.db")))
+        return self._omdb_client
+
+    @property
+    def _storage(self):
+        """The storage system chosen by data_source (CSV/JSON/JSONL/SQLite/Binary)."""
+        if self._storage_object is None:
+            self._storage_object = self.get_storage_object()
+        return self._storage_object
 
     def ask_user_for_data_source(self):
         """Asks the user for their storage choice and saves it."""
-        choice = input("Choose storage system (1 for CSV, 2 for JSON): ").strip()
+        prompt = "Choose storage system (1 for CSV, 2 for JSON, 3 for SQLite, 4 for JSON Lines, 5 for Binary): "
+        choice = input(prompt).strip()
 
-        while choice not in ['1', '2']:
-            print("Invalid input. Please choose 1 for CSV or 2 for JSON.")
-            choice = input("Choose storage system (1 for CSV, 2 for JSON): ").strip()
+        while choice not in ['1', '2', '3', '4', '5']:
+            print("Invalid input. Please choose 1 for CSV, 2 for JSON, 3 for SQLite, 4 for JSON Lines or 5 for Binary.")
+            choice = input(prompt).strip()
 
         # Save the chosen data source
-        self.data_source = "csv" if choice == "1" else "json"
+        self.data_source = {"1": "csv", "2": "json", "3": "sqlite", "4": "jsonl", "5": "binary"}[choice]
         save_data_source(self.data_source)  # Save the choice to config.json
 
-        print(f"Data source selected: {'CSV' if self.data_source == 'csv' else 'JSON'}")
+        names = {'csv': 'CSV', 'json': 'JSON', 'sqlite': 'SQLite', 'jsonl': 'JSON Lines', 'binary': 'Binary'}
+        print(f"Data source selected: {names[self.data_source]}")
 
     def get_storage_object(self):
         """Returns the appropriate storage object based on the user's choice."""
-        if self.data_source == "csv":
+        if self.data_source == "sqlite":
+            db_file_path = os.path.join(BASE_DIR, "data", "movies.db")
+            is_new = not os.path.exists(db_file_path)
+            storage = StorageSqlite(db_file_path)
+            if is_new:
+                # One-shot migration of an existing CSV/JSON collection into the new database
+                for source in ("movies.json", "movies.csv"):
+                    source_path = os.path.join(BASE_DIR, "data", source)
+                    if os.path.exists(source_path):
+                        migrate(source_path, db_file_path)
+                        break
+            return storage
+        elif self.data_source == "csv":
             csv_file_path = os.path.join(BASE_DIR, "data", "movies.csv")
             if not os.path.exists(csv_file_path):
                 print("CSV file not found. Creating a new file.")
                 with open(csv_file_path, 'w') as file:
                     file.write("")  # Create an empty CSV file if it doesn't exist
             return StorageCsv(csv_file_path)
+        elif self.data_source == "jsonl":
+            jsonl_file_path = os.path.join(BASE_DIR, "data", "movies.jsonl")
+            if not os.path.exists(jsonl_file_path):
+                # Start from an existing collection, exported in one streaming pass
+                for source in ("movies.json", "movies.csv"):
+                    source_path = os.path.join(BASE_DIR, "data", source)
+                    if os.path.exists(source_path):
+                        export_movies(source_path, jsonl_file_path)
+                        break
+            return StorageJsonl(jsonl_file_path)
+        elif self.data_source == "binary":
+            binary_file_path = os.path.join(BASE_DIR, "data", "movies.bin")
+            if not os.path.exists(binary_file_path):
+                # Start from an existing collection, converted in one streaming pass
+                for source in ("movies.json", "movies.csv"):
+                    source_path = os.path.join(BASE_DIR, "data", source)
+                    if os.path.exists(source_path):
+                        convert(source_path, binary_file_path)
+                        break
+            return StorageBinary(binary_file_path)
         else:
             json_file_path = os.path.join(BASE_DIR, "data", "movies.json")
             if not os.path.exists(json_file_path):  # Check if the JSON file exists
@@ -54,53 +121,104 @@ class MovieApp:
             return StorageJson(json_file_path)
 
     def _command_list_movies(self):
-        movies = self._storage.load_movies()  # Retrieve movies from the storage
-        if not movies:
-            print("No movies in the database.")
+        self.list_movies()
+
+    def list_movies(self, limit=None, sort=None, descending=False):
+        """Prints the movies in storage order, or sorted by rating, year or title, at most limit of them."""
+        if sort is None:
+            # Streams the movies from the storage, large catalogs are not loaded at once
+            movies = islice(self._storage.iter_movies(), limit)
         else:
-            print("Movies in Database:")
-            for index, movie_title in enumerate(movies, start=1):
-                movie = movies[movie_title]
-                print(
-                    f"{index}. {movie_title}, Rating: {movie['rating']}, Year: {movie['year']}, Poster URL: {movie['poster_url']}")
+            movies = self._storage.sorted_movies(sort, descending=descending, limit=limit)
+        index = 0
+        for index, (movie_title, movie) in enumerate(movies, start=1):
+            if index == 1:
+                print("Movies in Database:")
+            print(
+                f"{index}. {movie_title}, Rating: {movie['rating']}, Year: {movie['year']}, Poster URL: {movie['poster_url']}")
+        if not index:
+            print("No movies in the database.")
 
     def _command_add_movie(self):
         title = input("Enter the movie title: ")
+        self.add_movie(title)
+
+    def add_movie(self, query):
+        """Fetches a movie by title or IMDb ID from OMDb and saves it. Returns True if it was added."""
+        if not self.api_key:
+            print("Error: OMDB API key is missing!")
+            return False
+
+        from omdb_client import OmdbError
+        try:
+            movie = self._omdb.fetch_movie(query)
+        except OmdbError as e:
+            print(f"Error: {e}")
+            return False
+
+        # Save the movie
+        return self._storage.add_movie(movie['title'], movie['rating'], movie['year'], movie['poster_url'],
+                                       movie['imdbID'])
+
+    def _command_bulk_add_movies(self):
+        """
+        Reads titles or IMDb IDs (one per line) from a file or stdin, fetches them
+        concurrently from OMDb and stores all found movies in one batched write.
+        """
         if not self.api_key:
             print("Error: OMDB API key is missing!")
             return
 
-        url = f"http://www.omdbapi.com/?apikey={self.api_key}&t={title}"
+        path = input("Enter the path of the file with titles or IMDb IDs ('-' to type them, empty line to finish): ").strip()
+        if path == "-":
+            lines = iter(input, "")
+        else:
+            try:
+                with open(path, encoding="utf-8") as file:
+                    lines = file.readlines()
+            except IOError as e:
+                print(f"Error reading file: {e}")
+                return
+        self.bulk_add_movies(lines)
 
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                if data['Response'] == 'True':
-                    movie_title = data['Title']
-                    # Check if the year is a range and extract the first year
-                    year_str = data['Year']
-                    year = self._extract_year(year_str)
-                    rating = float(data['imdbRating']) if data['imdbRating'] != 'N/A' else 0.0
-                    poster_url = data['Poster'] if data['Poster'] != 'N/A' else 'No poster available'
-                    imdbID = data['imdbID'] if data['imdbID'] else 'No IMDb ID available'
-
-                    # Save the movie
-                    self._storage.add_movie(movie_title, rating, year, poster_url, imdbID)
-                else:
-                    print(f"Error: {data['Error']}")
+    def bulk_add_movies(self, lines):
+        """
+        Fetches the given titles or IMDb IDs and adds them to the storage in one batch.
+        Returns the list of added titles.
+        """
+        queries = list(dict.fromkeys(line.strip() for line in lines if line.strip()))  # Skip blanks and repeats
+        if not queries:
+            print("No titles to add.")
+            return []
+
+        print(f"Fetching {len(queries)} movies from OMDb...")
+        movies = []
+        for query, movie, error in self._omdb.fetch_movies(queries):
+            if error:
+                print(f"Error fetching '{query}': {error}")
             else:
-                print("Error: Unable to fetch data from OMDb API.")
-        except requests.exceptions.RequestException as e:
-            print(f"Error: Unable to connect to OMDb API. {e}")
-        except ValueError as e:
-            print(f"Error processing data: {e}")
-
-    def _extract_year(self, year_str):
-        """Extracts the first year from a year range (e.g. '2006–2013')."""
-        if '–' in year_str:
-            return int(year_str.split('–')[0])  # If there is a range, take the first year
-        return int(year_str)  # Otherwise, take the year as it is
+                movies.append(movie)
+
+        added = self._storage.add_movies(movies)
+        print(f"Added {len(added)} of {len(queries)} movies.")
+        return added
+
+    def _command_refresh_ratings(self):
+        """
+        Re-fetches all movies with an IMDb ID from OMDb and saves the changed ratings,
+        years and posters in one batched write.
+        """
+        if not self.api_key:
+            print("Error: OMDB API key is missing!")
+            return
+
+        force = input("Ignore cached OMDb answers? (y/N): ").strip().lower() == "y"
+        self.refresh_ratings(force)
+
+    def refresh_ratings(self, force=False):
+        """Re-syncs the ratings from OMDb, see omdb_refresh.refresh_ratings. Returns its report."""
+        from omdb_refresh import refresh_ratings
+        return refresh_ratings(self._storage, self._omdb, force=force)
 
     def _command_delete_movie(self):
         """
@@ -136,96 +254,84 @@ class MovieApp:
                 print("Invalid input. Please enter a valid number.")
 
     def _command_generate_website(self):
-        """Generates an HTML file displaying the movies."""
-        try:
-            with open("templates/index_template.html", encoding="utf-8") as template_file:
-                template = template_file.read()
-
-            movies = self._storage.load_movies()
-            if not movies:
-                print("No movies to display.")
-                return
-
-            movie_items = ""
-            for title, movie in movies.items():
-                movie_items += f"""
-                <li>
-                    <div class="movie">
-                        <img src="{movie['poster_url']}" alt="{title} poster">
-                        <h2>{title} <h2/>
-                        <h3> ({movie['year']})</h3>
-                        <p>Rating: {movie['rating']}</p>
-                    </div>
-                </li>
-                """
-
-            html_content = template.replace("__TEMPLATE_TITLE__", "My Movie App")
-            html_content = html_content.replace("__TEMPLATE_MOVIE_GRID__", movie_items)
-
-            with open("templates/index.html", "w", encoding="utf-8") as output_file:
-                output_file.write(html_content)
+        """Generates static HTML pages displaying the movies, skipping pages that did not change."""
+        from jinja2 import TemplateError, TemplateNotFound
+        from poster_cache import PosterCache
+        from site_generator import SiteGenerator
+
+        # Two streaming passes (count, then pages) instead of loading the whole catalog
+        count = self._storage.count_movies()
+        if not count:
+            print("No movies to display.")
+            return
 
-            print("Website was generated successfully.")
+        # Download the posters that aren't cached yet, so the pages can use local thumbnails
+        poster_cache = PosterCache()
+        fetched, cached, failed = poster_cache.fetch(movie["poster_url"] for _, movie in self._storage.iter_movies())
+        print(f"Poster thumbnails: {fetched} downloaded, {cached} already cached, {failed} failed.")
 
-        except FileNotFoundError:
+        try:
+            written, skipped = SiteGenerator(poster_cache=poster_cache).generate(self._storage.iter_movies(), count)
+        except TemplateNotFound:
             print("Error: index_template.html not found. Make sure the template file exists.")
-        except Exception as e:
+            return
+        except (IOError, TemplateError) as e:
             print(f"An error occurred: {e}")
+            return
+
+        if written:
+            print(f"Website was generated successfully ({written} page(s) written, {skipped} unchanged).")
+        else:
+            print("Website is already up to date.")
 
     def _command_movie_stats(self):
-        """Displays statistics about movie ratings."""
-        movies = self._storage.load_movies()
+        self.show_stats()
 
-        if not movies:
-            print("No movies in the database to analyze.")
+    def show_stats(self, as_json=False):
+        """
+        Displays statistics about movie ratings, or prints the whole statistics dictionary
+        (null without valid ratings) as JSON. File storages read the persisted summary, so
+        the catalog is only loaded if the summary is out of date.
+        """
+        stats = self._storage.movie_stats()
+        if as_json:
+            print(json.dumps(stats, indent=2))
             return
 
-        # Convert all ratings to floats to ensure there are no strings
-        ratings = []
-        for movie in movies.values():
-            try:
-                ratings.append(float(movie['rating']))
-            except ValueError:
-                print(f"Warning: Invalid rating for movie '{movie['title']}', skipping.")
-                continue
-
-        if not ratings:  # If there are no valid ratings
-            print("No valid ratings to analyze.")
+        if stats is None:  # If there are no valid ratings
+            index = 0
+            for index, (title, movie) in enumerate(self._storage.iter_movies(), start=1):
+                print(f"Warning: Invalid rating for movie '{title}', skipping.")
+            print("No valid ratings to analyze." if index else "No movies in the database to analyze.")
             return
 
-        avg_rating = sum(ratings) / len(ratings)
-        sorted_ratings = sorted(ratings)
-
-        # Calculate median
-        median_rating = sorted_ratings[len(ratings) // 2] if len(ratings) % 2 == 1 else \
-            (sorted_ratings[len(ratings) // 2 - 1] + sorted_ratings[len(ratings) // 2]) / 2
-
-        max_rating = max(ratings)
-        min_rating = min(ratings)
-
-        best_movies = [title for title, movie in movies.items() if float(movie['rating']) == max_rating]
-        worst_movies = [title for title, movie in movies.items() if float(movie['rating']) == min_rating]
+        for title in stats["invalid"]:
+            print(f"Warning: Invalid rating for movie '{title}', skipping.")
 
         print("\nStatistics:")
-        print(f"Average rating: {avg_rating:.2f}")
-        print(f"Median rating: {median_rating:.2f}")
-        print(f"Best movie(s): {', '.join(best_movies)} with a rating of {max_rating}")
-        print(f"Worst movie(s): {', '.join(worst_movies)} with a rating of {min_rating}")
+        print(f"Average rating: {stats['average']:.2f}")
+        print(f"Median rating: {stats['median']:.2f}")
+        print("Percentiles: " + ", ".join(f"{p}%: {value:.2f}" for p, value in stats['percentiles'].items()))
+        print(f"Best movie(s): {', '.join(stats['best_movies'])} with a rating of {stats['best_rating']}")
+        print(f"Worst movie(s): {', '.join(stats['worst_movies'])} with a rating of {stats['worst_rating']}")
 
     def _command_search_movie(self):
         """
         Prompts the user to enter a movie title and searches for it in the database.
+        Titles containing the search text are listed first, followed by similar titles (typos).
         """
         search_title = input("Enter the movie title to search for: ").strip()
-        movies = self._storage.load_movies()
+        self.search_movies(search_title)
 
-        matching_movies = {title: movie for title, movie in movies.items() if search_title.lower() in title.lower()}
+    def search_movies(self, search_title, limit=SEARCH_LIMIT):
+        """Prints up to limit movies matching the title, best matches first."""
+        matching_movies = self._storage.rank_movies(search_title, limit=limit)
 
         if not matching_movies:
             print(f"No movies found matching '{search_title}'.")
         else:
             print(f"Movies matching '{search_title}':")
-            for title, movie in matching_movies.items():
+            for title, movie, score in matching_movies:
                 print(f"{title} - Rating: {movie['rating']}, Year: {movie['year']}")
 
     def _command_random_movie(self):
@@ -238,42 +344,64 @@ class MovieApp:
         print(f"Random Movie: {movie[0]} ({movie[1]['year']}) - Rating: {movie[1]['rating']}")
 
     def _command_sort_movies(self):
-        """Sorts movies by rating in either ascending or descending order."""
+        """Shows the movies sorted by rating, year or title, page by page, optionally within a value range."""
         movies = self._storage.load_movies()
         if not movies:
             print("No movies to sort.")
             return
 
+        field = input("Sort by rating, year or title? (Enter for rating): ").strip().lower() or "rating"
+        while field not in SORT_FIELDS:
+            field = input("Invalid input. Please enter rating, year or title: ").strip().lower()
+
         sort_order = input("Do you want to sort movies in ascending or descending order? (a/d): ").strip().lower()
 
         while sort_order not in ['a', 'd']:
             sort_order = input("Invalid input. Please enter 'a' for ascending or 'd' for descending: ").strip().lower()
 
-        # Convert ratings to float for proper comparison
-        sorted_movies = sorted(movies.items(), key=lambda x: float(x[1]['rating']), reverse=(sort_order == 'd'))
-
-        for title, info in sorted_movies:
-            print(f"{title} ({info['year']}) - Rating: {info['rating']}")
+        low = high = None
+        if field != "title":
+            number_type, example = (float, "7.0-8.5") if field == "rating" else (int, "1990-1999")
+            while True:
+                value_range = input(f"Enter a {field} range like {example}, or leave out one end "
+                                    f"(Enter for all): ").strip()
+                if not value_range:
+                    break
+                low_text, separator, high_text = value_range.partition("-")
+                low, high = to_number(low_text, number_type), to_number(high_text, number_type)
+                if separator and (low is not None or not low_text.strip()) \
+                        and (high is not None or not high_text.strip()):
+                    break
+                print("Invalid range, try again.")
+                low = high = None
 
+        # Pages are read from the storage's sorted index, nothing is sorted here
+        offset = 0
+        while True:
+            page = self._storage.sorted_movies(field, descending=(sort_order == 'd'), offset=offset,
+                                               limit=SORT_PAGE_SIZE, low=low, high=high)
+            for title, info in page:
+                print(f"{title} ({info['year']}) - Rating: {info['rating']}")
+            offset += len(page)
+            if len(page) < SORT_PAGE_SIZE:
+                if not offset:
+                    print("No movies in that range.")
+                break
+            if input("Press Enter for more or q to stop: ").strip().lower() == "q":
+                break
 
     def _command_create_histogram(self):
-        """Creates and shows a histogram of the movie ratings."""
-        movies = self._storage.load_movies()
-        if not movies:
-            print("No movies to create histogram.")
-            return
-        ratings = [float(movie['rating']) for movie in movies.values()]
+        """Saves a histogram of the movie ratings as a PNG or SVG file (works without a display)."""
+        path = input(f"Save the histogram to (Enter for {HISTOGRAM_FILE}): ").strip() or HISTOGRAM_FILE
+        self.create_histogram(path)
 
-        if not ratings:
-            print("No valid ratings to create histogram.")
-            return
-
-        # Create and display the histogram
-        plt.hist(ratings, bins=10, edgecolor='black')
-        plt.title("Movie Rating Distribution")
-        plt.xlabel("Rating")
-        plt.ylabel("Frequency")
-        plt.show()
+    def create_histogram(self, path=HISTOGRAM_FILE):
+        """
+        Writes the rating histogram to path, see charts.write_chart. The bin counts are
+        maintained by the storage, so the ratings aren't gone over again. Returns True on success.
+        """
+        from charts import write_chart  # Imports matplotlib, only needed for the histogram
+        return write_chart(self._storage, path)
 
     def run(self):
         """Starts the movie app and lets the user choose a command."""
@@ -288,6 +416,8 @@ class MovieApp:
             print("7. Sort movies")
             print("8. Generate Website")
             print("9. Create histogram")
+            print("10. Bulk add movies")
+            print("11. Refresh ratings from OMDb")
             print("0. Exit")
 
             command = input("Enter a command number: ").strip()
@@ -313,6 +443,10 @@ class MovieApp:
                 self._command_generate_website()
             elif command == "9":
                 self._command_create_histogram()
+            elif command == "10":
+                self._command_bulk_add_movies()
+            elif command == "11":
+                self._command_refresh_ratings()
             else:
                 print("Invalid command, try again.")
 
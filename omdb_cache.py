@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# OMDb data rarely changes, keep responses for a week by default
+DEFAULT_TTL = int(os.getenv("OMDB_CACHE_TTL", 7 * 24 * 60 * 60))
+# "Movie not found!" may change once OMDb adds the movie
+DEFAULT_NEGATIVE_TTL = int(os.getenv("OMDB_CACHE_NEGATIVE_TTL", 24 * 60 * 60))
+DEFAULT_MAX_ENTRIES = int(os.getenv("OMDB_CACHE_SIZE", 10000))
+NOT_FOUND_ERRORS = {"Movie not found!", "Incorrect IMDb ID."}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def cache_key(params):
+    """Builds the cache key from the request parameters, e.g. 't:the matrix' or 'i:tt0133093'."""
+    if "i" in params:
+        return "i:" + params["i"].strip().lower()
+    return "t:" + " ".join(params.get("t", "").split()).casefold()
+
+
+class OmdbCache:
+    """
+    Persistent cache for OMDb responses stored in a single SQLite file.
+
+    Entries expire after ttl seconds ("Movie not found!" answers after negative_ttl),
+    and once more than max_entries are stored the least recently used ones are evicted.
+    """
+
+    def __init__(self, filename, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.filename = filename
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()  # Shared by the bulk import's worker threads
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._count = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, params):
+        """Returns the cached response for the request parameters or None on a miss."""
+        key = cache_key(params)
+        now = time.time()
+        try:
+            with self._lock, self._connection:
+                row = self._connection.execute(
+                    "SELECT response, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] < now:
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._count -= 1
+                    return None
+                self._connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"Error reading OMDb cache: {e}")
+            return None
+        return json.loads(row[0])
+
+    def put(self, params, response):
+        """Stores a response. Only found movies and "not found" answers are cached."""
+        if response.get("Response") == "True":
+            ttl = self.ttl
+        elif response.get("Error") in NOT_FOUND_ERRORS:
+            ttl = self.negative_ttl
+        else:
+            return  # Errors like an invalid API key or a reached request limit are not cached
+
+        now = time.time()
+        try:
+            with self._lock, self._connection:
+                exists = self._connection.execute(
+                    "SELECT 1 FROM responses WHERE key = ?", (cache_key(params),)).fetchone()
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (cache_key(params), json.dumps(response), now + ttl, now))
+                if not exists:
+                    self._count += 1
+                if self._count > self.max_entries:
+                    self._evict(self._count - self.max_entries)
+        except sqlite3.Error as e:
+            print(f"Error writing OMDb cache: {e}")
+
+    def _evict(self, count):
+        """Removes the count least recently used entries."""
+        self._connection.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)", (count,))
+        self._count -= count
+
+    def clear(self):
+        """Removes all cached responses."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+            self._count = 0
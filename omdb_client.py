@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from metrics import CACHE_HITS, CACHE_MISSES, OMDB_ERRORS, OMDB_SECONDS
+
+load_dotenv()
+
+# Can be pointed at a local fake OMDb server for testing
+OMDB_API_URL = os.getenv("OMDB_API_URL", "http://www.omdbapi.com/")
+IMDB_ID_PATTERN = re.compile(r"^tt\d+$")
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OmdbError(Exception):
+    """Raised when a movie could not be fetched from the OMDb API."""
+
+
+def extract_year(year_str):
+    """Extracts the first year from a year range (e.g. '2006–2013')."""
+    if '–' in year_str:
+        return int(year_str.split('–')[0])  # If there is a range, take the first year
+    return int(year_str)  # Otherwise, take the year as it is
+
+
+def parse_movie(data):
+    """Converts an OMDb response into the movie dictionary used by the storages."""
+    return {
+        "title": data['Title'],
+        "rating": float(data['imdbRating']) if data['imdbRating'] != 'N/A' else 0.0,
+        "year": extract_year(data['Year']),
+        "poster_url": data['Poster'] if data['Poster'] != 'N/A' else 'No poster available',
+        "imdbID": data['imdbID'] if data['imdbID'] else 'No IMDb ID available',
+    }
+
+
+class OmdbClient:
+    """
+    Fetches movies from the OMDb API over a pooled requests.Session.
+
+    Failed requests (connection errors, 5xx, 429) are retried with exponential backoff.
+    A Retry-After header or OMDb's "Request limit reached!" answer pauses all workers
+    of the client, not just the one that hit the limit. If an OmdbCache is given,
+    responses are looked up there before going over the network.
+    """
+
+    def __init__(self, api_key, base_url=OMDB_API_URL, max_workers=8, max_retries=3, backoff=0.5, timeout=10,
+                 cache=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pause_lock = threading.Lock()
+        self._paused_until = 0.0
+
+    def _pause(self, seconds):
+        """Makes every worker wait for the given number of seconds before its next request."""
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_if_paused(self):
+        with self._pause_lock:
+            delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _get(self, params):
+        """Sends a request to the API, retrying transient failures. Returns the decoded JSON."""
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * 2 ** attempt
+            self._wait_if_paused()
+            try:
+                with OMDB_SECONDS.time():
+                    response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                OMDB_ERRORS.inc(reason="connection")
+                if attempt == self.max_retries:
+                    raise OmdbError(f"Unable to connect to OMDb API. {e}")
+                time.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES:
+                OMDB_ERRORS.inc(reason="status")
+                if attempt == self.max_retries:
+                    raise OmdbError(f"OMDb API answered with status {response.status_code}.")
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    delay = int(retry_after)
+                if response.status_code == 429:
+                    self._pause(delay)
+                else:
+                    time.sleep(delay)
+                continue
+
+            try:
+                data = response.json()
+            except ValueError:
+                OMDB_ERRORS.inc(reason="invalid_response")
+                raise OmdbError("Unable to fetch data from OMDb API.")
+            if data.get("Error") == "Request limit reached!" and attempt < self.max_retries:
+                OMDB_ERRORS.inc(reason="rate_limit")
+                self._pause(delay)
+                continue
+            if response.status_code != 200 and data.get("Response") != "False":
+                OMDB_ERRORS.inc(reason="status")
+                raise OmdbError("Unable to fetch data from OMDb API.")
+            return data
+
+        raise OmdbError("Unable to fetch data from OMDb API.")
+
+    def fetch_movie(self, query, use_cache=True):
+        """
+        Fetches a movie by title or IMDb ID (e.g. 'tt1375666') and returns it as a movie dictionary.
+
+        With use_cache=False the cache is skipped for the lookup but still updated with the answer.
+        """
+        query = query.strip()
+        params = {"apikey": self.api_key}
+        params["i" if IMDB_ID_PATTERN.match(query) else "t"] = query
+
+        data = self.cache.get(params) if self.cache and use_cache else None
+        if data is not None:
+            CACHE_HITS.inc(cache="omdb")
+        else:
+            if self.cache:
+                CACHE_MISSES.inc(cache="omdb")
+            data = self._get(params)
+            if self.cache:
+                self.cache.put(params, data)
+        if data.get("Response") != "True":
+            OMDB_ERRORS.inc(reason="api")
+            raise OmdbError(data.get("Error", "Unknown error"))
+        try:
+            return parse_movie(data)
+        except (KeyError, ValueError) as e:
+            raise OmdbError(f"Error processing data: {e}")
+
+    def fetch_movies(self, queries, use_cache=True):
+        """
+        Fetches many movies concurrently with at most max_workers requests in flight.
+
+        Returns a list of (query, movie, error) tuples in the order of the queries,
+        where either movie or error is None. use_cache works like in fetch_movie.
+        """
+        def fetch(query):
+            try:
+                return query, self.fetch_movie(query, use_cache), None
+            except OmdbError as e:
+                return query, None, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(fetch, queries))
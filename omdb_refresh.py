@@ -0,0 +1,119 @@
+import argparse
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from config import BASE_DIR
+from omdb_cache import OmdbCache
+from omdb_client import IMDB_ID_PATTERN, OmdbClient
+from storage.istorage import UPDATE_FIELDS, to_number
+from storage.formats import open_storage
+
+load_dotenv()
+
+BATCH_SIZE = 200  # IMDb IDs handed to the client's worker pool at a time
+
+
+def changed_fields(movie, fetched):
+    """Returns the fields of a stored movie that differ from the movie fetched from OMDb."""
+    changes = {}
+    for field in UPDATE_FIELDS:
+        old, new = movie.get(field), fetched[field]
+        if field == "poster_url":
+            same = old == new
+        else:
+            same = to_number(old) == new  # '7.5' read from a CSV file equals 7.5
+        if not same:
+            changes[field] = new
+    return changes
+
+
+def refresh_ratings(storage, client, force=False, batch_size=BATCH_SIZE):
+    """
+    Re-fetches every movie with an IMDb ID from OMDb and writes the changed ratings, years
+    and poster URLs back with a single update_movies() call.
+
+    The catalog is streamed and fetched batch_size IDs at a time by the client's worker pool,
+    movies sharing an IMDb ID are fetched once. Answers that are still fresh in the client's
+    cache are used without a request, so only entries older than the cache TTL go over the
+    network; force=True asks OMDb for every movie.
+
+    Returns a dictionary with the numbers of checked, updated, unchanged, skipped (no IMDb ID)
+    and failed movies, the seconds it took and the movies checked per second.
+    """
+    started = time.monotonic()
+    report = {"checked": 0, "updated": 0, "unchanged": 0, "skipped": 0, "errors": 0}
+    changes = {}
+    batch = {}  # IMDb ID -> [(title, movie)]
+
+    def fetch_batch():
+        for imdb_id, fetched, error in client.fetch_movies(list(batch), use_cache=not force):
+            movies = batch[imdb_id]
+            report["checked"] += len(movies)
+            if error:
+                print(f"Error refreshing '{movies[0][0]}' ({imdb_id}): {error}")
+                report["errors"] += len(movies)
+                continue
+            for title, movie in movies:
+                fields = changed_fields(movie, fetched)
+                if fields:
+                    changes[title] = fields
+                else:
+                    report["unchanged"] += 1
+        batch.clear()
+        elapsed = time.monotonic() - started
+        print(f"Checked {report['checked']} movies ({report['checked'] / elapsed:.1f} movies/s)...")
+
+    for title, movie in storage.iter_movies():
+        imdb_id = str(movie.get("imdbID") or "")
+        if not IMDB_ID_PATTERN.match(imdb_id):
+            report["skipped"] += 1
+            continue
+        batch.setdefault(imdb_id, []).append((title, movie))
+        if len(batch) >= batch_size:
+            fetch_batch()
+    if batch:
+        fetch_batch()
+
+    if changes:
+        report["updated"] = len(storage.update_movies(changes))
+    report["seconds"] = time.monotonic() - started
+    report["per_second"] = report["checked"] / report["seconds"] if report["seconds"] else 0.0
+    print(f"Refreshed {report['checked']} movies in {report['seconds']:.1f}s ({report['per_second']:.1f} movies/s): "
+          f"{report['updated']} updated, {report['unchanged']} unchanged, {report['errors']} errors, "
+          f"{report['skipped']} without IMDb ID.")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-syncs ratings, years and posters from OMDb by IMDb ID.")
+    parser.add_argument("path", help="movies.csv, .json, .jsonl, .bin or .db file")
+    parser.add_argument("--force", action="store_true", help="ignore cached OMDb answers")
+    parser.add_argument("--every", type=float, metavar="HOURS", help="keep running and refresh every HOURS hours")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent OMDb requests (default 8)")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("OMDB_API_KEY")
+    if not api_key:
+        print("API key missing!")
+        return 1
+    if not os.path.exists(args.path):
+        print(f"File {args.path} not found.")
+        return 1
+    try:
+        storage = open_storage(args.path)
+    except ValueError as e:
+        print(e)
+        return 1
+    client = OmdbClient(api_key, max_workers=args.workers,
+                        cache=OmdbCache(os.path.join(BASE_DIR, "data", "omdb_cache.db")))
+    while True:
+        refresh_ratings(storage, client, force=args.force)
+        if args.every is None:
+            return 0
+        time.sleep(args.every * 60 * 60)
+
+
+if __name__ == "__main__":
+    # Usage: python omdb_refresh.py data/movies.csv [--force] [--every 24]
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from config import BASE_DIR
+from storage.safe_io import atomic_write
+
+POSTER_DIR = os.path.join(BASE_DIR, "static", "posters")
+POSTER_PREFIX = "posters"  # Path of POSTER_DIR below static/
+INDEX_NAME = "index.json"
+THUMBNAIL_SIZE = (256, 386)  # Twice the size shown in the grid, sharp on high-density screens
+THUMBNAIL_QUALITY = 85
+
+
+def is_remote(url):
+    """True for http(s) poster URLs, storages also contain placeholders like 'No poster available'."""
+    return isinstance(url, str) and url.startswith(("http://", "https://"))
+
+
+def make_thumbnail(data, size=THUMBNAIL_SIZE):
+    """
+    Returns (image bytes, file extension) of a JPEG thumbnail that fits into size.
+    Without Pillow installed the downloaded image is kept as it is.
+    """
+    try:
+        from PIL import Image  # Optional, only needed for resizing
+    except ImportError:
+        return data, ".png" if data.startswith(b"\x89PNG") else ".jpg"
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail(size)
+        output = io.BytesIO()
+        image.convert("RGB").save(output, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    return output.getvalue(), ".jpg"
+
+
+class PosterCache:
+    """
+    Local cache of poster thumbnails under static/posters.
+
+    Posters are downloaded concurrently, resized and stored content-addressed (the file
+    name is the hash of the thumbnail, so identical posters share one file). index.json
+    maps every poster URL to its file, so cached posters are not downloaded again.
+    Posters that failed are not retried until the process restarts.
+    """
+
+    def __init__(self, directory=POSTER_DIR, prefix=POSTER_PREFIX, size=THUMBNAIL_SIZE, max_workers=8, timeout=10):
+        self.directory = directory
+        self.prefix = prefix
+        self.size = size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._index = {}  # poster URL -> file name
+        self._index_state = None
+        self._failed = set()
+        self._worker = None
+        self.refresh()
+
+    def refresh(self):
+        """Re-reads index.json if another process (e.g. the CLI) changed it."""
+        try:
+            state = os.stat(self.index_path).st_mtime_ns
+        except OSError:
+            return
+        if state == self._index_state:
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as file:
+                index = json.load(file)
+        except (IOError, json.JSONDecodeError):
+            return
+        with self._lock:
+            self._index.update(index)
+            self._index_state = state
+
+    def version(self):
+        """Changes whenever thumbnails were added, used for the ETag of pages showing them."""
+        self.refresh()
+        return len(self._index)
+
+    def thumbnail(self, url):
+        """Returns the thumbnail's path below static/ (e.g. 'posters/3f2a....jpg') or None if it isn't cached."""
+        name = self._index.get(url)
+        return f"{self.prefix}/{name}" if name else None
+
+    def _download(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        data, extension = make_thumbnail(response.content, self.size)
+        name = hashlib.sha256(data).hexdigest()[:32] + extension
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            with atomic_write(path, "wb") as file:
+                file.write(data)
+        return name
+
+    def _save_index(self):
+        """Merges our entries into index.json, keeping entries other processes added meanwhile."""
+        try:
+            with open(self.index_path, encoding="utf-8") as file:
+                index = json.load(file)
+        except (IOError, json.JSONDecodeError):
+            index = {}
+        with self._lock:
+            index.update(self._index)
+            self._index = index
+        with atomic_write(self.index_path, encoding="utf-8") as file:
+            json.dump(index, file, indent=1)
+        self._index_state = os.stat(self.index_path).st_mtime_ns
+
+    def fetch(self, urls):
+        """
+        Downloads and caches the posters that aren't cached yet, max_workers at a time.
+
+        Returns (fetched, skipped, failed): the numbers of new thumbnails, posters that
+        were already cached and posters that could not be downloaded or decoded.
+        """
+        self.refresh()
+        urls = list(dict.fromkeys(url for url in urls if is_remote(url)))  # Unique, in order
+        missing = [url for url in urls if url not in self._index]
+        skipped = len(urls) - len(missing)
+        failed = len([url for url in missing if url in self._failed])
+        missing = [url for url in missing if url not in self._failed]
+        fetched = 0
+        if not missing:
+            return fetched, skipped, failed
+
+        os.makedirs(self.directory, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._download, url): url for url in missing}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    name = future.result()
+                except (requests.RequestException, OSError, ValueError) as e:
+                    print(f"Could not cache poster {url}: {e}")
+                    self._failed.add(url)
+                    failed += 1
+                    continue
+                with self._lock:
+                    self._index[url] = name
+                fetched += 1
+
+        if fetched:
+            try:
+                self._save_index()
+            except IOError as e:
+                print(f"Error saving poster index: {e}")
+        return fetched, skipped, failed
+
+    def fetch_in_background(self, urls):
+        """Runs fetch() in a daemon thread unless one is still running. Returns True if it was started."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return False
+            self._worker = threading.Thread(target=self.fetch, args=(list(urls),), daemon=True)
+            self._worker.start()
+        return True
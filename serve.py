@@ -0,0 +1,166 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+import app as web
+from storage.snapshot import SNAPSHOT_DIR, SnapshotStore
+
+POLL_INTERVAL = 2.0  # Seconds between checks of config.json and the data file
+logger = logging.getLogger(__name__)
+
+
+class SnapshotPublisher:
+    """
+    Publishes a new snapshot whenever the data source in config.json or its data changes.
+    Only the publishing process reads the data file, the workers map the snapshots.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._data_source = None
+        self._storage = None
+        self._version = None
+
+    def poll(self):
+        """Publishes a snapshot if anything changed since the last one. Returns True if one was published."""
+        data_source = web.load_data_source()
+        if data_source != self._data_source:
+            self._data_source = data_source
+            self._storage = web.open_source(data_source)
+            self._version = None
+        if self._storage is None:
+            return False
+        version = self._storage.data_version()  # Read first, changes made while publishing trigger the next one
+        if version is not None and version == self._version:
+            return False
+        if self.store.publish(self._storage) is None:
+            return False
+        self._version = version
+        return True
+
+
+def fetch_posters(store):
+    """
+    Caches the posters of the current snapshot in a child process, so the supervisor stays
+    single-threaded and can fork workers safely. Returns the child's pid.
+    """
+    pid = os.fork()
+    if pid == 0:
+        try:
+            snapshot = store.open_current()
+            if snapshot is not None:
+                web.poster_cache.fetch(movie["poster_url"] for _, movie in snapshot.iter_movies())
+        finally:
+            os._exit(0)
+    return pid
+
+
+def run_worker(listener):
+    """Serves requests from the shared listening socket until the worker is terminated."""
+    from werkzeug.serving import make_server  # Only needed by the workers
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, web.app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def start_worker(listener):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(listener)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def serve(host, port, workers, poll=POLL_INTERVAL, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Runs the given number of worker processes, which accept connections from one shared socket
+    and serve the current snapshot, and re-publishes the snapshot every poll seconds if the data
+    changed. Workers that die are restarted. Returns when the supervisor gets SIGTERM or SIGINT.
+    """
+    store = SnapshotStore(snapshot_dir)
+    publisher = SnapshotPublisher(store)
+    if not publisher.poll() and store.current() is None:
+        print("No movie data to serve, add movies or check the data source in config.json.")
+        return 1
+    web.snapshot_store = store
+
+    listener = socket.create_server((host, port), backlog=128)
+    listener.set_inheritable(True)
+    pids = {start_worker(listener) for _ in range(workers)}
+    poster_pid = fetch_posters(store)
+    print(f"Serving on http://{host}:{port} with {workers} workers (snapshots in {snapshot_dir}).")
+
+    stopping = []
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signal_number, lambda *_: stopping.append(True))
+    try:
+        while not stopping:
+            time.sleep(poll)
+            if publisher.poll() and poster_pid is None:
+                poster_pid = fetch_posters(store)
+            while True:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+                if pid == poster_pid:
+                    poster_pid = None
+                elif pid in pids:
+                    pids.discard(pid)
+                    if not stopping:
+                        logger.warning("Worker %s exited (status %s), starting a new one.", pid, status)
+                        pids.add(start_worker(listener))
+    finally:
+        for pid in pids | ({poster_pid} if poster_pid else set()):
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        listener.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves the movie app with several worker processes.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=5000, help="port to listen on (default 5000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL,
+                        help=f"seconds between checks for changed data (default {POLL_INTERVAL})")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help=f"snapshot directory (default {SNAPSHOT_DIR})")
+    parser.add_argument("--publish-only", action="store_true",
+                        help="only publish snapshots, for workers run by another WSGI server with "
+                             "MOVIE_SNAPSHOT_DIR set")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    if args.publish_only:
+        publisher = SnapshotPublisher(SnapshotStore(args.snapshot_dir))
+        while True:
+            publisher.poll()
+            time.sleep(args.poll)
+    if not hasattr(os, "fork"):
+        print("Worker processes need os.fork, which this platform lacks. Run another WSGI server with "
+              "MOVIE_SNAPSHOT_DIR set and 'python serve.py --publish-only' instead.")
+        return 1
+    if args.workers < 1:
+        print("Use at least one worker.")
+        return 1
+    return serve(args.host, args.port, args.workers, poll=args.poll, snapshot_dir=args.snapshot_dir)
+
+
+if __name__ == "__main__":
+    # Usage: python serve.py [--workers 4] [--port 5000]
+    sys.exit(main())
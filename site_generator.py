@@ -0,0 +1,131 @@
+import hashlib
+import json
+import math
+import os
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from config import BASE_DIR
+from metrics import TEMPLATE_SECONDS
+
+TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
+TEMPLATE_NAME = "index_template.html"
+OUTPUT_DIR = TEMPLATE_DIR
+MANIFEST_NAME = ".site_manifest.json"
+SITE_PAGE_SIZE = 500  # Movies per generated page
+
+
+def page_filename(number):
+    """Returns the file name of a generated page, the first page is index.html."""
+    return "index.html" if number == 1 else f"index-{number}.html"
+
+
+def static_url(name):
+    """Generated pages live in templates/, so static files are one directory up."""
+    return f"../static/{name}"
+
+
+def poster_src(movie):
+    """Returns the local thumbnail of a page row if the poster is cached, otherwise the remote poster URL."""
+    return static_url(movie["thumbnail"]) if movie["thumbnail"] else movie["poster_url"]
+
+
+def _hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class SiteGenerator:
+    """
+    Renders the movie grid into static HTML pages (index.html, index-2.html, ...).
+
+    Pages are streamed chunk by chunk from the Jinja template into the output file. A
+    manifest next to the pages stores a content hash per page, so pages whose movies and
+    template did not change are not rendered again. With a PosterCache the pages show the
+    local thumbnails of cached posters instead of the remote images.
+    """
+
+    def __init__(self, template_dir=TEMPLATE_DIR, output_dir=OUTPUT_DIR, page_size=SITE_PAGE_SIZE,
+                 title="My Movie App", poster_cache=None):
+        self.template_dir = template_dir
+        self.output_dir = output_dir
+        self.page_size = page_size
+        self.title = title
+        self.poster_cache = poster_cache
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self._environment = Environment(loader=FileSystemLoader(template_dir), autoescape=select_autoescape())
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        with open(self.manifest_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=4)
+
+    def _pages(self, movies):
+        """Splits (title, movie) tuples into lists of template rows, one list per page (at least one)."""
+        page = []
+        empty = True
+        for title, movie in movies:
+            thumbnail = self.poster_cache.thumbnail(movie["poster_url"]) if self.poster_cache else None
+            page.append({"title": title, **movie, "thumbnail": thumbnail})
+            if len(page) == self.page_size:
+                yield page
+                page = []
+                empty = False
+        if page or empty:
+            yield page
+
+    def generate(self, movies, count=None):
+        """
+        Writes the pages for the given movies dictionary, or for an iterable of (title, movie)
+        tuples such as storage.iter_movies() together with the number of movies as count.
+        Only one page is held in memory at a time.
+
+        Returns (written, skipped) with the numbers of rendered and unchanged pages.
+        """
+        if count is None:
+            movies, count = movies.items(), len(movies)
+        with open(os.path.join(self.template_dir, TEMPLATE_NAME), "rb") as template_file:
+            template_hash = _hash(template_file.read())
+        template = self._environment.get_template(TEMPLATE_NAME)
+
+        page_count = max(1, math.ceil(count / self.page_size))
+        old_manifest = self._load_manifest()
+        old_pages = old_manifest.get("pages", {}) if old_manifest.get("template") == template_hash else {}
+        manifest = {"template": template_hash, "pages": {}}
+        written = skipped = 0
+
+        for number, page in enumerate(self._pages(movies), start=1):
+            filename = page_filename(number)
+            path = os.path.join(self.output_dir, filename)
+            # The page also links to its neighbours, so the page count is part of its content
+            page_hash = _hash(json.dumps([page_count, page], sort_keys=True, default=str).encode("utf-8"))
+            manifest["pages"][filename] = page_hash
+            if old_pages.get(filename) == page_hash and os.path.exists(path):
+                skipped += 1
+                continue
+
+            stream = template.stream(
+                title=self.title,
+                movie_grid=page,
+                next_offset=None,
+                static_url=static_url,
+                poster_src=poster_src,
+                page_number=number,
+                page_count=page_count,
+                previous_page=page_filename(number - 1) if number > 1 else None,
+                next_page=page_filename(number + 1) if number < page_count else None,
+            )
+            with TEMPLATE_SECONDS.time(template=TEMPLATE_NAME), open(path, "w", encoding="utf-8") as output_file:
+                stream.dump(output_file)  # Writes the rendered chunks as they are produced
+            written += 1
+
+        # Remove pages left over from a bigger catalog
+        for filename in old_manifest.get("pages", {}):
+            if filename not in manifest["pages"] and os.path.exists(os.path.join(self.output_dir, filename)):
+                os.remove(os.path.join(self.output_dir, filename))
+
+        self._save_manifest(manifest)
+        return written, skipped
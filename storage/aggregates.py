@@ -0,0 +1,127 @@
+import bisect
+import json
+from storage.istorage import HISTOGRAM_BINS, PERCENTILES, RATING_RANGE, to_number
+from storage.safe_io import atomic_write
+
+
+def histogram_bin(rating):
+    """Returns the index of the fixed-width histogram bin for a rating (clamped to RATING_RANGE)."""
+    low, high = RATING_RANGE
+    index = int((rating - low) / (high - low) * HISTOGRAM_BINS)
+    return min(max(index, 0), HISTOGRAM_BINS - 1)
+
+
+class RatingAggregates:
+    """
+    Running rating statistics that are updated on every add/update/delete.
+
+    Ratings are counted per distinct value in a sorted list (IMDb ratings only have about
+    a hundred distinct values), which gives the median, percentiles and best/worst rating
+    without looking at the movies. Titles are kept per rating for the best/worst ties,
+    the histogram as counts per fixed-width bin and the per-year figures as count and sum.
+    """
+
+    def __init__(self):
+        self._values = []  # Sorted distinct ratings
+        self._titles = {}  # rating -> {title: None}, insertion ordered
+        self._invalid = {}  # titles without a numeric rating
+        self._histogram = [0] * HISTOGRAM_BINS
+        self._years = {}  # year -> [count, sum of ratings]
+
+    def add(self, title, movie):
+        rating = to_number(movie['rating'])
+        if rating is None:
+            self._invalid[title] = None
+            return
+        if rating not in self._titles:
+            bisect.insort(self._values, rating)
+            self._titles[rating] = {}
+        self._titles[rating][title] = None
+        self._histogram[histogram_bin(rating)] += 1
+        year = to_number(movie['year'], int)
+        if year and year > 0:
+            year_totals = self._years.setdefault(year, [0, 0.0])
+            year_totals[0] += 1
+            year_totals[1] += rating
+
+    def remove(self, title, movie):
+        rating = to_number(movie['rating'])
+        if rating is None:
+            self._invalid.pop(title, None)
+            return
+        titles = self._titles.get(rating)
+        if titles is None or title not in titles:
+            return
+        del titles[title]
+        if not titles:
+            del self._titles[rating]
+            del self._values[bisect.bisect_left(self._values, rating)]
+        self._histogram[histogram_bin(rating)] -= 1
+        year = to_number(movie['year'], int)
+        if year in self._years:
+            year_totals = self._years[year]
+            year_totals[0] -= 1
+            year_totals[1] -= rating
+            if not year_totals[0]:
+                del self._years[year]
+
+    def _nth(self, index):
+        """Returns the index-th smallest rating by walking the distinct values."""
+        for value in self._values:
+            count = len(self._titles[value])
+            if index < count:
+                return value
+            index -= count
+        raise IndexError(index)
+
+    def _percentile(self, percentile, count):
+        """Percentile with linear interpolation, like numpy.percentile."""
+        position = percentile / 100 * (count - 1)
+        lower = int(position)
+        low_value = self._nth(lower)
+        if lower + 1 >= count:
+            return low_value
+        return low_value + (self._nth(lower + 1) - low_value) * (position - lower)
+
+    def summary(self):
+        """Returns the statistics in the format of IStorage.movie_stats, or None without valid ratings."""
+        count = sum(len(titles) for titles in self._titles.values())
+        if not count:
+            return None
+        best_rating, worst_rating = self._values[-1], self._values[0]
+        return {
+            "count": count,
+            "average": sum(value * len(self._titles[value]) for value in self._values) / count,
+            "median": self._percentile(50, count),
+            "percentiles": {str(p): self._percentile(p, count) for p in PERCENTILES},
+            "best_rating": best_rating,
+            "best_movies": list(self._titles[best_rating]),
+            "worst_rating": worst_rating,
+            "worst_movies": list(self._titles[worst_rating]),
+            "invalid": list(self._invalid),
+            "per_year": [{"year": year, "count": totals[0], "average": totals[1] / totals[0]}
+                         for year, totals in sorted(self._years.items())],
+            "histogram": list(self._histogram),
+        }
+
+
+def save_summary(path, version, summary):
+    """Persists a summary together with the data version it was computed for."""
+    try:
+        with atomic_write(path, encoding="utf-8") as file:
+            json.dump({"version": version, "summary": summary}, file)
+    except IOError as e:
+        print(f"Error writing statistics: {e}")
+
+
+def load_summary(path, version):
+    """Returns the persisted summary if it was computed for the given data version, otherwise False."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+    except (IOError, json.JSONDecodeError):
+        return False
+    if data.get("version") != json.loads(json.dumps(version)):  # Tuples come back as lists
+        return False
+    return data.get("summary")
+
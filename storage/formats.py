@@ -0,0 +1,17 @@
+import os
+from storage.storage_binary import StorageBinary
+from storage.storage_csv import StorageCsv
+from storage.storage_json import StorageJson
+from storage.storage_jsonl import StorageJsonl
+from storage.storage_sqlite import StorageSqlite
+
+STORAGE_CLASSES = {".csv": StorageCsv, ".json": StorageJson, ".jsonl": StorageJsonl, ".db": StorageSqlite,
+                   ".bin": StorageBinary}
+
+
+def open_storage(path):
+    """Returns the storage for a movies.csv, .json, .jsonl, .db or .bin file. Raises ValueError for other files."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in STORAGE_CLASSES:
+        raise ValueError(f"Unknown movie file type '{extension or path}', use one of {', '.join(STORAGE_CLASSES)}.")
+    return STORAGE_CLASSES[extension](path)
@@ -1,7 +1,45 @@
 from abc import ABC, abstractmethod
+from metrics import timed_method
+
+SORT_FIELDS = ("title", "rating", "year")
+UPDATE_FIELDS = ("rating", "year", "poster_url")  # Fields update_movies can change
+PERCENTILES = (10, 25, 75, 90)  # Rating percentiles reported by movie_stats
+HISTOGRAM_BINS = 10  # movie_stats counts ratings in fixed-width bins over RATING_RANGE
+RATING_RANGE = (0.0, 10.0)
+# Methods whose durations are recorded in metrics.STORAGE_SECONDS for every storage
+INSTRUMENTED_METHODS = ("load_movies", "get_movie", "list_movies", "add_movie", "add_movies", "delete_movie",
+                        "update_movie", "update_movies", "iter_movies", "count_movies", "search_movies",
+                        "rank_movies", "autocomplete", "sorted_movies", "query_movies", "movie_stats", "compact",
+                        "import_movies")
+
+
+def to_number(value, number_type=float):
+    """Converts a stored rating/year (a number or, in CSV files, a string) or returns None if it isn't numeric."""
+    try:
+        return number_type(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_title(title):
+    """Normalizes a title for lookups, e.g. ' The Matrix ' and 'the matrix' are the same movie."""
+    return " ".join(str(title).split()).casefold()
 
 
 class IStorage(ABC):
+    def __init_subclass__(cls, **kwargs):
+        """Wraps the INSTRUMENTED_METHODS a storage class defines with timing, see metrics.timed_method."""
+        super().__init_subclass__(**kwargs)
+        _instrument(cls)
+
+    @abstractmethod
+    def load_movies(self):
+        pass
+
+    @abstractmethod
+    def get_movie(self, imdb_id):
+        pass
+
     @abstractmethod
     def list_movies(self):
         pass
@@ -16,4 +54,173 @@ class IStorage(ABC):
 
     @abstractmethod
     def update_movie(self, title, rating, poster_url):
-        pass
\ No newline at end of file
+        pass
+
+    def data_version(self):
+        """
+        Returns a value that changes whenever the stored movies change, so callers can cache
+        things derived from them. None means the storage can't tell and callers must not cache.
+        """
+        return None
+
+    def add_movies(self, movies):
+        """
+        Adds several movies, skipping duplicates. Storages override this to write them in one batch.
+
+        Movies are dictionaries with the keys title, rating, year, poster_url and imdbID.
+        Returns the list of added titles.
+        """
+        return [movie["title"] for movie in movies
+                if self.add_movie(movie["title"], movie["rating"], movie["year"], movie["poster_url"], movie["imdbID"])]
+
+    def update_movies(self, changes):
+        """
+        Updates several movies. Storages override this to write all changes in one batch.
+
+        Changes map titles to dictionaries of the changed UPDATE_FIELDS, e.g.
+        {"Heat": {"rating": 8.3}}. Titles that aren't stored are skipped.
+        Returns the list of updated titles.
+        """
+        movies = self.load_movies()
+        updated = []
+        for title, fields in changes.items():
+            if title in movies:
+                movie = movies[title]
+                if self.update_movie(title, fields.get("rating", movie["rating"]),
+                                     fields.get("poster_url", movie["poster_url"])) is not False:
+                    updated.append(title)
+        return updated
+
+    def iter_movies(self):
+        """
+        Yields (title, movie) tuples in storage order. Storages override this to stream the
+        movies instead of loading them all, so a single pass needs little memory.
+        """
+        yield from self.load_movies().items()
+
+    def count_movies(self):
+        """Returns the number of movies."""
+        return sum(1 for _ in self.iter_movies())
+
+    def search_movies(self, query):
+        """Returns all movies whose title contains the query (case-insensitive)."""
+        query = query.lower()
+        return {title: movie for title, movie in self.iter_movies() if query in title.lower()}
+
+    def _titles(self):
+        """Yields the stored titles. Storages override this to read the titles without the movies."""
+        for title, _ in self.iter_movies():
+            yield title
+
+    def _movies_with_titles(self, titles):
+        """Returns {title: movie} for the given titles that are stored. Storages override this to look them up."""
+        movies = self.load_movies()
+        return {title: movies[title] for title in titles if title in movies}
+
+    def _get_search_index(self):
+        """Returns a SearchIndex over the titles, rebuilt only when data_version() changes."""
+        from storage.search_index import SearchIndex
+        version = self.data_version()
+        cached = getattr(self, "_cached_search_index", None)
+        if cached is None or version is None or cached[0] != version:
+            cached = (version, SearchIndex(self._titles()))
+            self._cached_search_index = cached
+        return cached[1]
+
+    def rank_movies(self, query, limit=10):
+        """
+        Returns up to limit (title, movie, score) tuples matching the query with typo tolerance, best first.
+        Only the matched movies are fetched from the storage.
+        """
+        matches = self._get_search_index().search(query, limit)
+        movies = self._movies_with_titles([title for title, _ in matches])
+        return [(title, movies[title], score) for title, score in matches if title in movies]
+
+    def autocomplete(self, prefix, limit=10):
+        """Returns up to limit titles with a word starting with the prefix."""
+        return self._get_search_index().autocomplete(prefix, limit)
+
+    def _get_sorted_index(self, field):
+        """Returns a SortedIndex for the field, rebuilt only when data_version() changes."""
+        from storage.sorted_index import SortedIndex
+        version = self.data_version()
+        if getattr(self, "_cached_sorted_indexes", None) is None or version is None \
+                or self._cached_sorted_indexes[0] != version:
+            self._cached_sorted_indexes = (version, {})
+        indexes = self._cached_sorted_indexes[1]
+        if field not in indexes:
+            indexes[field] = SortedIndex(field, self.load_movies())
+        return indexes[field]
+
+    def sorted_movies(self, field="rating", descending=False, offset=0, limit=None, low=None, high=None):
+        """
+        Returns (title, movie) tuples ordered by field (rating, year or title) from a sorted index,
+        e.g. the top 10 with descending=True, limit=10 or the ratings 7.0 to 8.5 with low=7.0, high=8.5.
+        Movies without a numeric value come last and are left out when low or high is given.
+        """
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Can't sort by '{field}', use one of {', '.join(SORT_FIELDS)}.")
+        movies = self.load_movies()
+        titles = self._get_sorted_index(field).titles(descending, offset, limit, low, high)
+        return [(title, movies[title]) for title in titles]
+
+    def sort_movies(self, descending=False):
+        """Returns a list of (title, movie) tuples sorted by rating."""
+        return self.sorted_movies("rating", descending)
+
+    def query_movies(self, title=None, min_rating=None, year_from=None, year_to=None,
+                     sort=None, descending=False, offset=0, limit=50):
+        """
+        Returns one page of movies matching the filters as (total, [(title, movie), ...]),
+        where total is the number of matching movies across all pages.
+
+        Without sort the movies keep the storage order. Ties are ordered by title in the same
+        direction. Movies without a numeric rating/year are left out by the rating/year filters
+        and sorted last, in storage order, when sorting by that field.
+        """
+        if sort is not None and sort not in SORT_FIELDS:
+            raise ValueError(f"Can't sort by '{sort}', use one of {', '.join(SORT_FIELDS)}.")
+        title = title.lower() if title else None
+
+        matches = []
+        for movie_title, movie in self.load_movies().items():
+            rating = to_number(movie['rating'])
+            year = to_number(movie['year'], int)
+            if title and title not in movie_title.lower():
+                continue
+            if min_rating is not None and (rating is None or rating < min_rating):
+                continue
+            if year_from is not None and (year is None or year < year_from):
+                continue
+            if year_to is not None and (year is None or year > year_to):
+                continue
+            key = {"title": movie_title.lower(), "rating": rating, "year": year}.get(sort, 0)
+            matches.append((key, movie_title, movie))
+
+        if sort is None:
+            return len(matches), [(movie_title, movie) for _, movie_title, movie in matches[offset:offset + limit]]
+        valid = [match for match in matches if match[0] is not None]
+        valid.sort(key=lambda match: match[:2], reverse=descending)
+        ordered = valid + [match for match in matches if match[0] is None]
+        return len(ordered), [(movie_title, movie) for _, movie_title, movie in ordered[offset:offset + limit]]
+
+    def movie_stats(self):
+        """
+        Returns rating statistics as a dictionary (see aggregates.RatingAggregates.summary), or
+        None if there are no valid ratings. The movies are streamed once into running aggregates.
+        """
+        from storage.aggregates import RatingAggregates  # Imported here, aggregates imports istorage itself
+        aggregates = RatingAggregates()
+        for title, movie in self.iter_movies():
+            aggregates.add(title, movie)
+        return aggregates.summary()
+
+
+def _instrument(cls):
+    for name in INSTRUMENTED_METHODS:
+        method = cls.__dict__.get(name)
+        if callable(method) and not getattr(method, "__isabstractmethod__", False):
+            setattr(cls, name, timed_method(method, name))
+
+
+_instrument(IStorage)  # The default implementations
@@ -0,0 +1,61 @@
+from collections.abc import Mapping
+from storage.istorage import to_number
+
+MOVIE_FIELDS = ("rating", "year", "poster_url", "imdbID")
+
+
+def _parse(value, number_type):
+    """Returns the value as a number, values that aren't numeric (e.g. 'N/A') are kept as they are."""
+    number = to_number(value, number_type)
+    return value if number is None else number
+
+
+class MovieRecord(Mapping):
+    """
+    One movie, with the rating parsed to a float and the year to an int once when it is loaded.
+
+    The fields live in __slots__ instead of a per-movie dictionary, which takes a fraction of
+    the memory for large catalogs. It is a read-only Mapping, so movie['rating'], .get(),
+    .items() and {**movie} keep working for the templates and existing callers.
+    """
+    __slots__ = MOVIE_FIELDS
+
+    def __init__(self, rating, year, poster_url="", imdbID=""):
+        self.rating = _parse(rating, float)
+        self.year = _parse(year, int)
+        self.poster_url = poster_url
+        self.imdbID = imdbID
+
+    @classmethod
+    def from_dict(cls, movie):
+        """Builds a record from a movie dictionary as stored in the JSON file or the journal."""
+        return cls(movie.get("rating"), movie.get("year"), movie.get("poster_url", ""), movie.get("imdbID", ""))
+
+    def update(self, changes):
+        """Changes some fields in place, like dict.update (used for journal update entries)."""
+        for key, value in changes.items():
+            if key == "rating":
+                value = _parse(value, float)
+            elif key == "year":
+                value = _parse(value, int)
+            elif key not in MOVIE_FIELDS:
+                raise KeyError(key)
+            setattr(self, key, value)
+
+    def to_dict(self):
+        """Returns the movie as a plain dictionary, e.g. for json.dump."""
+        return {"rating": self.rating, "year": self.year, "poster_url": self.poster_url, "imdbID": self.imdbID}
+
+    def __getitem__(self, key):
+        if key not in MOVIE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(MOVIE_FIELDS)
+
+    def __len__(self):
+        return len(MOVIE_FIELDS)
+
+    def __repr__(self):
+        return f"MovieRecord({self.to_dict()!r})"
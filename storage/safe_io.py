@@ -0,0 +1,110 @@
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, there only the threads of one process are synchronized
+    fcntl = None
+
+
+def _fsync_directory(directory):
+    """Makes a rename in the directory durable (not supported on every platform)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, mode="w", **kwargs):
+    """
+    Opens a temporary file next to path for writing. When the block ends without an error the
+    file is flushed, fsynced and renamed over path with os.replace, so after a crash path holds
+    either the complete old or the complete new content, never a truncated file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        try:
+            os.chmod(temp_path, stat.S_IMODE(os.stat(path).st_mode))  # Keep the permissions of the old file
+        except OSError:
+            os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, mode, **kwargs) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+class FileLock:
+    """
+    Advisory lock on a lock file next to the data file (e.g. movies.csv.lock), shared for
+    readers and exclusive for writers, so the web app and CLI instances can use the same files.
+
+    The lock is re-entrant within a thread: a batched write that calls other locked methods
+    takes the file lock only once, and an exclusive request inside a shared one upgrades it.
+    Threads of one process are serialized with an RLock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._modes = []  # Stack of the modes held by the owning thread
+        self._file = None
+
+    @contextmanager
+    def shared(self):
+        with self._held(exclusive=False):
+            yield
+
+    @contextmanager
+    def exclusive(self):
+        with self._held(exclusive=True):
+            yield
+
+    @contextmanager
+    def _held(self, exclusive):
+        with self._thread_lock:
+            was_exclusive = True in self._modes
+            if fcntl and (not self._modes or (exclusive and not was_exclusive)):
+                self._lock_file(fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._modes.append(exclusive)
+            try:
+                yield
+            finally:
+                self._modes.pop()
+                if not self._modes:
+                    self._unlock_file()
+                elif fcntl and exclusive and not was_exclusive:
+                    self._lock_file(fcntl.LOCK_SH)  # Back to the shared lock of the outer block
+
+    def _lock_file(self, operation):
+        if self._file is None:
+            try:
+                self._file = open(self.path, "a")
+            except IOError as e:
+                print(f"Warning: Could not open lock file {self.path}: {e}")
+                return
+        fcntl.flock(self._file.fileno(), operation)
+
+    def _unlock_file(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,138 @@
+import bisect
+import re
+from collections import Counter
+
+NON_ALPHANUMERIC = re.compile(r"[\W_]+")
+GRAMS_PER_TYPO = 4  # A substitution changes 3 of the query's trigrams, a transposition 4
+TYPO_LENGTH = 8  # One typo is tolerated per started 8 characters of the query
+MAX_CANDIDATES = 300  # Titles scored per search at most
+COUNT_LIMIT = 20000  # Postings up to this total size are counted to choose the candidates
+
+
+def search_key(text):
+    """Normalizes text for searching: case-folded, punctuation replaced by spaces."""
+    return " ".join(NON_ALPHANUMERIC.sub(" ", str(text).casefold()).split())
+
+
+def typo_budget(key):
+    """Returns the number of typos tolerated in a normalized query, e.g. 1 for 'matrx', 2 for 'silnt rivr'."""
+    return 1 + (len(key) - 1) // TYPO_LENGTH
+
+
+def trigrams(key):
+    """Returns the set of trigrams of a normalized key, padded so word boundaries count too."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Trigram and prefix index over the movie titles.
+
+    search() finds titles that share most trigrams with the query, which tolerates typos,
+    and ranks them by similarity. autocomplete() bisects a sorted list of every word
+    suffix of the titles ("the matrix", "matrix"), so "mat" completes to "The Matrix".
+    Both are updated incrementally with add() and remove().
+    """
+
+    def __init__(self, titles=()):
+        self._postings = {}  # trigram -> {title: None}, in insertion order so capped searches are repeatable
+        self._prefixes = []  # sorted (word suffix of the key, title)
+        for title in titles:
+            key = search_key(title)
+            for gram in trigrams(key):
+                self._postings.setdefault(gram, {})[title] = None
+            self._prefixes.extend((suffix, title) for suffix in self._word_suffixes(key))
+        self._prefixes.sort()  # Sorting once is much cheaper than inserting one by one
+
+    @staticmethod
+    def _word_suffixes(key):
+        starts = [0] + [match.end() for match in re.finditer(" ", key)]
+        return [key[start:] for start in starts]
+
+    def add(self, title):
+        key = search_key(title)
+        for gram in trigrams(key):
+            self._postings.setdefault(gram, {})[title] = None
+        for suffix in self._word_suffixes(key):
+            bisect.insort(self._prefixes, (suffix, title))
+
+    def remove(self, title):
+        key = search_key(title)
+        for gram in trigrams(key):
+            titles = self._postings.get(gram)
+            if titles is not None:
+                titles.pop(title, None)
+                if not titles:
+                    del self._postings[gram]
+        for suffix in self._word_suffixes(key):
+            index = bisect.bisect_left(self._prefixes, (suffix, title))
+            if index < len(self._prefixes) and self._prefixes[index] == (suffix, title):
+                del self._prefixes[index]
+
+    def search(self, query, limit=10):
+        """
+        Returns up to limit (title, score) tuples for titles similar to the query, best first.
+
+        Titles containing the query rank above fuzzy matches. The score is the share of the
+        trigrams of query and title that both have, so shorter titles win over longer ones
+        that merely contain similar words.
+        """
+        key = search_key(query)
+        if not key:
+            return []
+        if len(key) < 3:
+            return [(title, 1.0) for title in self.autocomplete(key, limit)]
+
+        query_grams = trigrams(key)
+        postings = sorted((self._postings.get(gram, {}) for gram in query_grams), key=len)
+        # Each tolerated typo may cost GRAMS_PER_TYPO trigrams, titles sharing fewer are too far off
+        min_shared = max(1, len(query_grams) - GRAMS_PER_TYPO * typo_budget(key))
+        # A title sharing min_shared of the query's trigrams contains one of the
+        # len(query_grams) - min_shared + 1 rarest ones, so only their titles are candidates
+        results = []
+        for title in self._candidates(postings[:len(query_grams) - min_shared + 1]):
+            count = sum(title in titles for titles in postings)
+            if count >= min_shared:
+                title_key = search_key(title)
+                # Shared trigrams of all trigrams in both, a key has at most len + 1 of them
+                score = count / (len(query_grams) + len(title_key) + 1 - count)
+                results.append((key not in title_key, -score, len(title), title))
+        results.sort()
+        return [(title, -negative_score) for _, negative_score, _, title in results[:limit]]
+
+    @staticmethod
+    def _candidates(postings):
+        """
+        Returns at most MAX_CANDIDATES titles from the postings to score. If the postings are
+        small, the titles found in most of them are chosen. Common words have huge postings,
+        so their titles are taken in order, rarest posting first, until there are enough.
+        """
+        if sum(len(titles) for titles in postings) <= COUNT_LIMIT:
+            hits = Counter()
+            for titles in postings:
+                hits.update(titles.keys())  # Counts the titles, a dict would add its values
+            return [title for title, _ in hits.most_common(MAX_CANDIDATES)]
+        candidates = {}
+        for titles in postings:
+            for title in titles:
+                candidates[title] = None
+                if len(candidates) >= MAX_CANDIDATES:
+                    return candidates
+        return candidates
+
+    def autocomplete(self, prefix, limit=10):
+        """Returns up to limit titles where a word starts with the prefix, in alphabetical order."""
+        key = search_key(prefix)
+        if not key:
+            return []
+        titles = []
+        index = bisect.bisect_left(self._prefixes, (key,))
+        while index < len(self._prefixes) and len(titles) < limit:
+            suffix, title = self._prefixes[index]
+            if not suffix.startswith(key):
+                break
+            if title not in titles:
+                titles.append(title)
+            index += 1
+        return titles
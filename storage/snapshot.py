@@ -0,0 +1,218 @@
+import array
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from storage.istorage import SORT_FIELDS, to_number
+from storage.safe_io import FileLock, atomic_write
+from storage.search_index import SearchIndex
+from storage.storage_binary import RECORD, YEAR_MISSING, StorageBinary, write_catalog
+
+SNAPSHOT_DIR = "data/snapshots"
+CATALOG_NAME = "movies.bin"
+CURRENT_NAME = "CURRENT"  # Holds the name of the snapshot to serve, replaced atomically
+SNAPSHOT_PREFIX = "snapshot-"
+KEEP_SNAPSHOTS = 3  # Older snapshots are deleted, the previous ones stay for requests still reading them
+ORDER_TYPE = "I"  # Record numbers in the sort order files, unsigned 32 bit
+
+
+def order_name(field, descending):
+    return f"{field}.{'desc' if descending else 'asc'}.order"
+
+
+class SnapshotStorage(StorageBinary):
+    """
+    A read-only binary catalog in a snapshot directory, served by several worker processes at once.
+
+    Besides movies.bin the directory holds the record numbers in the order of every sort field
+    and direction (e.g. rating.desc.order) and the persisted statistics. Everything is opened
+    with mmap, so the workers share the operating system's page cache instead of each parsing
+    and holding its own copy: pages are decoded by position, sorted pages are read from the
+    order files and filtered queries scan the mapped records without building a dictionary.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._orders = {}  # (field, descending) -> record numbers, a view of the mapped order file
+        self._search = None  # (SearchIndex, title -> record number), built on the first search
+        super().__init__(os.path.join(directory, CATALOG_NAME))
+
+    def _log_mutations(self, entries):
+        print(f"Snapshot {self.directory} is read-only, change the data file instead.")
+        return False
+
+    def compact(self):
+        return False
+
+    def write_orders(self):
+        """Writes the sort order files (see IStorage.query_movies for the order), used when publishing."""
+        keys = {field: [] for field in SORT_FIELDS}
+        missing = {field: [] for field in SORT_FIELDS}
+        for index, (title, movie) in enumerate(self._iter_file()):
+            values = {"title": title.lower(), "rating": to_number(movie["rating"]),
+                      "year": to_number(movie["year"], int)}
+            for field, value in values.items():
+                if value is None:
+                    missing[field].append(index)
+                else:
+                    keys[field].append((value, title, index))
+        for field in SORT_FIELDS:
+            for descending in (False, True):
+                # Ties are ordered by title like query_movies, movies without a value keep the catalog order
+                ordered = sorted(keys[field], key=lambda key: key[:2], reverse=descending)
+                numbers = array.array(ORDER_TYPE, [index for *_, index in ordered] + missing[field])
+                with atomic_write(os.path.join(self.directory, order_name(field, descending)), "wb") as file:
+                    numbers.tofile(file)
+
+    def _order(self, field, descending):
+        """Returns the record numbers sorted by field, mapped from the order file on first use."""
+        key = (field, descending)
+        if key not in self._orders:
+            with open(os.path.join(self.directory, order_name(field, descending)), "rb") as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    self._orders[key] = ()  # Empty files can't be mapped
+                else:
+                    self._orders[key] = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)).cast(
+                        ORDER_TYPE)
+        return self._orders[key]
+
+    def _filter(self, data, count, records_offset, title, min_rating, year_from, year_to):
+        """Returns the numbers of the records matching the filters, the title is only decoded if needed."""
+        matches = []
+        records = data[records_offset:records_offset + count * RECORD.size]
+        for index, (rating, year, title_offset, title_length, *_) in enumerate(RECORD.iter_unpack(records)):
+            if min_rating is not None and not rating >= min_rating:  # NaN (no rating) never matches
+                continue
+            if year_from is not None and (year == YEAR_MISSING or year < year_from):
+                continue
+            if year_to is not None and (year == YEAR_MISSING or year > year_to):
+                continue
+            if title and title not in str(data[title_offset:title_offset + title_length], "utf-8").lower():
+                continue
+            matches.append(index)
+        return matches
+
+    def query_movies(self, title=None, min_rating=None, year_from=None, year_to=None,
+                     sort=None, descending=False, offset=0, limit=50):
+        """Returns one page of movies (see IStorage.query_movies) from the mapped records and order files."""
+        if sort is not None and sort not in SORT_FIELDS:
+            raise ValueError(f"Can't sort by '{sort}', use one of {', '.join(SORT_FIELDS)}.")
+        try:
+            data, count, records_offset = self._open_map()
+            if title or min_rating is not None or year_from is not None or year_to is not None:
+                numbers = self._filter(data, count, records_offset, title.lower() if title else None,
+                                       min_rating, year_from, year_to)
+                if sort is not None:
+                    matches = set(numbers)
+                    numbers = [index for index in self._order(sort, descending) if index in matches]
+            elif sort is not None:
+                numbers = self._order(sort, descending)
+            else:
+                numbers = range(count)
+            return len(numbers), [self._record(data, records_offset, index)
+                                  for index in numbers[offset:offset + limit]]
+        except (IOError, ValueError, struct.error) as e:
+            print(f"Error reading snapshot {self.directory}: {e}")
+            return 0, []
+
+    def _get_search_index(self):
+        """Returns the title search index, built from the mapped titles without decoding the movies."""
+        if self._search is None:
+            data, count, records_offset = self._open_map()
+            positions = {}
+            for index, (_, _, title_offset, title_length, *_) in enumerate(
+                    RECORD.iter_unpack(data[records_offset:records_offset + count * RECORD.size])):
+                positions[str(data[title_offset:title_offset + title_length], "utf-8")] = index
+            self._search = (SearchIndex(positions), positions)
+        return self._search[0]
+
+    def rank_movies(self, query, limit=10):
+        """Returns up to limit (title, movie, score) tuples, see IStorage.rank_movies."""
+        index = self._get_search_index()
+        positions = self._search[1]
+        data, _, records_offset = self._open_map()
+        return [(*self._record(data, records_offset, positions[title]), score)
+                for title, score in index.search(query, limit)]
+
+
+class SnapshotStore:
+    """
+    A directory of versioned snapshots (snapshot-<time>/) and a CURRENT file naming the one to serve.
+
+    publish() writes a complete new snapshot next to the others and then replaces CURRENT
+    atomically, so readers see either the old or the new catalog. open_current() costs one
+    stat per call and switches to the new snapshot once CURRENT changed.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS):
+        self.directory = directory
+        self.keep = keep
+        self.current_path = os.path.join(directory, CURRENT_NAME)
+        self._file_lock = FileLock(os.path.join(directory, "publish.lock"))
+        self._lock = threading.Lock()
+        self._state = None
+        self._snapshot = None
+
+    def current(self):
+        """Returns the name of the current snapshot or None if none was published."""
+        try:
+            with open(self.current_path, encoding="utf-8") as file:
+                return file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def open_current(self):
+        """Returns the SnapshotStorage of the current snapshot (reused while CURRENT is unchanged) or None."""
+        try:
+            stat = os.stat(self.current_path)
+            state = stat.st_ino, stat.st_mtime_ns
+        except OSError:
+            state = None
+        with self._lock:
+            if state != self._state:
+                name = self.current()
+                path = os.path.join(self.directory, name) if name else None
+                # The old storage stays usable for requests that still hold it, its maps close with it
+                self._snapshot = SnapshotStorage(path) if path and os.path.isdir(path) else None
+                self._state = state
+            return self._snapshot
+
+    def reset(self):
+        """Forgets the opened snapshot, the next open_current() opens it again."""
+        with self._lock:
+            self._state = None
+            self._snapshot = None
+
+    def publish(self, storage):
+        """
+        Writes the movies of storage into a new snapshot, with sort orders and statistics, and makes
+        it current. Returns the snapshot's name or None if it could not be written.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._file_lock.exclusive():
+            name = f"{SNAPSHOT_PREFIX}{time.time_ns()}"
+            path = os.path.join(self.directory, name)
+            try:
+                os.makedirs(path)
+                count = write_catalog(os.path.join(path, CATALOG_NAME), storage.iter_movies())
+                snapshot = SnapshotStorage(path)
+                snapshot.write_orders()
+                snapshot.movie_stats()  # Persists the statistics, so the workers don't compute them
+                with atomic_write(self.current_path, encoding="utf-8") as file:
+                    file.write(name)
+            except (IOError, ValueError) as e:
+                print(f"Error writing snapshot {path}: {e}")
+                shutil.rmtree(path, ignore_errors=True)
+                return None
+            self._prune()
+        print(f"Published snapshot {name} with {count} movies.")
+        return name
+
+    def _prune(self):
+        """Deletes all but the newest keep snapshots. Workers that still map a deleted one keep reading it."""
+        names = sorted((name for name in os.listdir(self.directory) if name.startswith(SNAPSHOT_PREFIX)),
+                       key=lambda name: int(name[len(SNAPSHOT_PREFIX):]))
+        for name in names[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
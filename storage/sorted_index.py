@@ -0,0 +1,112 @@
+import bisect
+from storage.istorage import to_number
+
+SORT_KEYS = {
+    "rating": lambda title, movie: to_number(movie['rating']),
+    "year": lambda title, movie: to_number(movie['year'], int),
+    "title": lambda title, movie: title.casefold(),
+}
+
+
+class SortedIndex:
+    """
+    Titles kept sorted by one field (rating, year or title), maintained with bisection.
+
+    Top/bottom N, pages and value ranges are slices of the sorted lists, so they cost
+    O(log n + k) instead of sorting the whole catalog per request. Movies without a
+    numeric value are kept apart and come after all others.
+    """
+
+    def __init__(self, field, movies=None):
+        self.key = SORT_KEYS[field]
+        self._keys = []  # Sorted values
+        self._titles = []  # Titles in the same order as _keys
+        self._invalid = {}  # Titles without a value, insertion ordered
+        if movies:
+            items = []
+            for title, movie in movies.items():
+                value = self.key(title, movie)
+                if value is None:
+                    self._invalid[title] = None
+                else:
+                    items.append((value, title))
+            items.sort()  # One sort when building, bisection afterwards
+            self._keys = [value for value, _ in items]
+            self._titles = [title for _, title in items]
+
+    def add(self, title, movie):
+        value = self.key(title, movie)
+        if value is None:
+            self._invalid[title] = None
+            return
+        # Ties are ordered by title, so the position of a (value, title) pair is unique
+        index = bisect.bisect_left(self._keys, value)
+        end = bisect.bisect_right(self._keys, value, lo=index)
+        index = bisect.bisect_left(self._titles, title, lo=index, hi=end)
+        self._keys.insert(index, value)
+        self._titles.insert(index, title)
+
+    def remove(self, title, movie):
+        value = self.key(title, movie)
+        if value is None:
+            self._invalid.pop(title, None)
+            return
+        index = bisect.bisect_left(self._keys, value)
+        end = bisect.bisect_right(self._keys, value, lo=index)
+        index = bisect.bisect_left(self._titles, title, lo=index, hi=end)
+        if index < end and self._titles[index] == title:
+            del self._keys[index]
+            del self._titles[index]
+
+    def count(self, low=None, high=None):
+        """Returns the number of titles titles() returns without offset and limit."""
+        if low is None and high is None:
+            return len(self._titles) + len(self._invalid)
+        start = bisect.bisect_left(self._keys, low) if low is not None else 0
+        end = bisect.bisect_right(self._keys, high) if high is not None else len(self._keys)
+        return max(end - start, 0)
+
+    def sort_titles(self, titles, movies, descending=False, low=None, high=None):
+        """
+        Returns the given titles in the order of titles(), limited to low <= value <= high.
+        Cheaper than filtering titles() when they are a small part of the index.
+        """
+        items, invalid = [], set()
+        for title in titles:
+            value = self.key(title, movies[title])
+            if value is None:
+                invalid.add(title)
+            elif (low is None or value >= low) and (high is None or value <= high):
+                items.append((value, title))
+        items.sort(reverse=descending)
+        ordered = [title for _, title in items]
+        if low is None and high is None and invalid:
+            ordered += [title for title in self._invalid if title in invalid]
+        return ordered
+
+    def titles(self, descending=False, offset=0, limit=None, low=None, high=None):
+        """
+        Returns the titles ordered by the field, skipping offset and returning at most limit.
+        With low and/or high only titles with low <= value <= high are returned.
+        """
+        start = bisect.bisect_left(self._keys, low) if low is not None else 0
+        end = bisect.bisect_right(self._keys, high) if high is not None else len(self._keys)
+        ranged = low is not None or high is not None
+        stop = None if limit is None else offset + limit
+
+        if descending:
+            # Walk the slice from the end without copying the whole range
+            first, last = max(end - offset, start), end - (stop if stop is not None else end - start)
+            titles = self._titles[max(last, start):first][::-1]
+        else:
+            titles = self._titles[start + offset:end if stop is None else min(start + stop, end)]
+        if ranged:
+            return titles
+
+        # Movies without a value come last
+        remaining = None if limit is None else limit - len(titles)
+        if remaining is None or remaining > 0:
+            skip = max(offset - (end - start), 0)
+            invalid = list(self._invalid)[skip:None if remaining is None else skip + remaining]
+            titles.extend(invalid)
+        return titles
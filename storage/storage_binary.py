@@ -0,0 +1,176 @@
+import math
+import mmap
+import os
+import struct
+import sys
+from storage.movie_record import MovieRecord
+from storage.safe_io import atomic_write
+from storage.storage_file import JOURNAL_LIMIT
+from storage.storage_json import StorageJson
+
+MAGIC = b"MOVIEBIN"
+FORMAT_VERSION = 1
+# magic, format version, number of records, file offset of the first record
+HEADER = struct.Struct("<8sIIQ")
+# rating, year, then (offset, length) of the title, poster URL and imdbID in the string heap
+RECORD = struct.Struct("<di" + "QI" * 3)
+YEAR_MISSING = -2 ** 31  # Stored for years that aren't numeric
+MISSING = "N/A"  # Returned for ratings and years that weren't numeric
+
+
+def write_catalog(filename, movies):
+    """
+    Writes (title, movie) tuples to a binary catalog in one pass and returns the number written.
+
+    The strings go to the heap right after the header as they come, the fixed-width records
+    are collected (48 bytes per movie) and appended at the end. The file is written next to
+    the target and swapped in atomically, so open memory maps never see a half-written file.
+    """
+    records = bytearray()
+    count = 0
+    with atomic_write(filename, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0))
+        for title, movie in movies:
+            refs = []
+            for text in (title, movie["poster_url"], movie["imdbID"]):
+                data = str(text if text is not None else "").encode("utf-8")
+                refs += [file.tell(), len(data)]
+                file.write(data)
+            rating, year = movie["rating"], movie["year"]
+            rating = float(rating) if isinstance(rating, (int, float)) else math.nan
+            year = year if isinstance(year, int) and -2 ** 31 < year < 2 ** 31 else YEAR_MISSING
+            records += RECORD.pack(rating, year, *refs)
+            count += 1
+        records_offset = file.tell()
+        file.write(records)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, records_offset))
+    return count
+
+
+class StorageBinary(StorageJson):
+    """
+    Stores the movies in a binary catalog (movies.bin) that is opened with mmap.
+
+    Each movie is a fixed-width record (rating, year and references into a string heap), so
+    opening the file only reads the header and movie number n is found at a computed offset.
+    Pages of unfiltered, unsorted results are read straight from the map without parsing the
+    rest of the file. Ratings and years that weren't numeric are stored as missing (N/A).
+    Adding, updating and deleting go through the journal like StorageJson, compaction
+    rewrites the catalog.
+    """
+
+    def __init__(self, filename, journal_limit=JOURNAL_LIMIT):
+        self._map = None  # Set before the base class may create the file
+        self._map_state = None
+        super().__init__(filename, journal_limit)
+
+    def _open_map(self):
+        """Returns (mmap, record count, records offset) for the current file, remapping it if it was replaced."""
+        state = self._stat(self.filename)
+        if self._map is None or state != self._map_state:
+            self._close_map()
+            with open(self.filename, "rb") as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count, records_offset = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                self._close_map()
+                raise ValueError(f"{self.filename} is not a movie catalog (version {FORMAT_VERSION}).")
+            self._map_state = state
+            self._count, self._records_offset = count, records_offset
+        return self._map, self._count, self._records_offset
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._map_state = None
+
+    @staticmethod
+    def _record(data, records_offset, index):
+        """Decodes record number index of a mapped catalog into (title, MovieRecord)."""
+        rating, year, *refs = RECORD.unpack_from(data, records_offset + index * RECORD.size)
+        title, poster_url, imdb_id = (str(data[offset:offset + length], "utf-8")
+                                      for offset, length in zip(refs[::2], refs[1::2]))
+        return title, MovieRecord(MISSING if math.isnan(rating) else rating,
+                                  MISSING if year == YEAR_MISSING else year, poster_url, imdb_id)
+
+    def _write_file(self, movies):
+        """Rewrites the binary catalog with all movies."""
+        try:
+            write_catalog(self.filename, movies.items())
+            self._mark_written()
+            return True
+        except IOError as e:
+            print(f"Error saving to file {self.filename}: {e}")
+            self._mark_written(success=False)
+            return False
+
+    def _read_file(self):
+        """Decodes all records and returns the movies as a dictionary."""
+        return dict(self._iter_file())
+
+    def _iter_file(self):
+        """Yields the records in file order as (title, MovieRecord) tuples."""
+        try:
+            data, count, records_offset = self._open_map()
+        except (IOError, ValueError, struct.error) as e:
+            print(f"Error reading binary catalog: {e}")
+            return
+        for index in range(count):
+            yield self._record(data, records_offset, index)
+
+    def _without_journal(self):
+        """True if the catalog file alone holds the movies, so records can be read by position."""
+        return self._stat(self.journal_filename) is None
+
+    def count_movies(self):
+        """Returns the number of movies, read from the header when there are no pending changes."""
+        if self._without_journal():
+            try:
+                return self._open_map()[1]
+            except (IOError, ValueError, struct.error):
+                pass
+        return super().count_movies()
+
+    def query_movies(self, title=None, min_rating=None, year_from=None, year_to=None,
+                     sort=None, descending=False, offset=0, limit=50):
+        """Returns one page of movies (see IStorage.query_movies), unfiltered pages are read by position."""
+        unfiltered = not title and min_rating is None and year_from is None and year_to is None and sort is None
+        if unfiltered and self._without_journal():
+            try:
+                data, count, records_offset = self._open_map()
+            except (IOError, ValueError, struct.error):
+                data = None
+            if data is not None:
+                return count, [self._record(data, records_offset, index)
+                               for index in range(offset, min(offset + limit, count))]
+        return super().query_movies(title, min_rating, year_from, year_to, sort, descending, offset, limit)
+
+
+def convert(source_path, target_path):
+    """Converts a movies.csv, .json, .jsonl, .db or .bin file into a binary catalog in one streaming pass."""
+    from storage.formats import open_storage  # formats imports this module
+    if not os.path.exists(source_path):
+        print(f"File {source_path} not found.")
+        return 0
+    try:
+        source = open_storage(source_path)
+    except ValueError as e:
+        print(e)
+        return 0
+    try:
+        converted = write_catalog(target_path, source.iter_movies())
+    except IOError as e:
+        print(f"Error writing {target_path}: {e}")
+        return 0
+    print(f"Converted {converted} movies from {source_path} into {target_path}.")
+    return converted
+
+
+if __name__ == "__main__":
+    # Usage: python -m storage.storage_binary data/movies.csv data/movies.bin
+    if len(sys.argv) != 3:
+        print("Usage: python -m storage.storage_binary <movies.csv|movies.json|movies.jsonl|movies.db|movies.bin> <movies.bin>")
+        sys.exit(1)
+    convert(sys.argv[1], sys.argv[2])
@@ -0,0 +1,444 @@
+import json
+import os
+from abc import abstractmethod
+from metrics import BYTES_READ, BYTES_WRITTEN, CACHE_HITS, CACHE_MISSES, FILE_PARSES, STORAGE_ERRORS
+from storage.aggregates import RatingAggregates, load_summary, save_summary
+from storage.istorage import SORT_FIELDS, UPDATE_FIELDS, IStorage, normalize_title
+from storage.movie_record import MovieRecord
+from storage.safe_io import FileLock
+from storage.search_index import SearchIndex
+from storage.sorted_index import SortedIndex
+
+JOURNAL_SUFFIX = ".journal"
+STATS_SUFFIX = ".stats.json"
+LOCK_SUFFIX = ".lock"
+JOURNAL_LIMIT = 1024 * 1024  # Fold the journal back into the data file once it passes 1 MB
+
+
+class StorageFile(IStorage):
+    """
+    Base class for file based storages.
+
+    Keeps a parsed in-memory copy of the data file which is updated on every write
+    and only re-parsed when the file's mtime or size changes on disk. Alongside the movies
+    it keeps hash indexes by imdbID and normalized title so lookups and duplicate checks
+    don't have to scan the whole collection.
+
+    Mutations are not written to the data file directly but appended to a journal
+    next to it (e.g. movies.csv.journal). Reads replay the journal over the data file,
+    and once the journal passes journal_limit bytes it is compacted back into the data file.
+
+    Rating statistics are kept as running aggregates that every mutation updates in memory.
+    The summary is persisted next to the data file (e.g. movies.csv.stats.json) when the
+    statistics are read or the journal is compacted, together with the file state it belongs
+    to, so movie_stats() can be answered without parsing the catalog while the files are unchanged.
+
+    Data files are replaced atomically (see safe_io.atomic_write) and an advisory lock file
+    (e.g. movies.csv.lock) is held shared while re-reading and exclusive while changing the
+    movies, so several processes (web app, CLI) can use the same files without lost updates.
+    """
+
+    def __init__(self, filename, journal_limit=JOURNAL_LIMIT):
+        self.filename = filename
+        self.journal_filename = filename + JOURNAL_SUFFIX
+        self.stats_filename = filename + STATS_SUFFIX
+        self._file_lock = FileLock(filename + LOCK_SUFFIX)
+        self.journal_limit = journal_limit
+        self._movies = None
+        self._signature = None
+        self._by_imdb_id = {}  # imdbID -> list of titles (placeholder IDs may be shared)
+        self._by_title = {}  # normalized title -> title
+        self._aggregates = RatingAggregates()
+        self._stats_signature = None  # File state the persisted summary was written for
+        self._search_index = None
+        self._sorted_indexes = {}
+
+    @staticmethod
+    def _stat(path):
+        """Returns (mtime, size) of a file or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _file_signature(self):
+        """Returns the state of the data file and its journal."""
+        return self._stat(self.filename), self._stat(self.journal_filename)
+
+    def _read_file(self):
+        """Parses the data file and returns the movies as a dictionary."""
+        return dict(self._iter_file())
+
+    def _count_read(self, signature, mode):
+        """Counts a pass over the data file and journal of the given signature for the metrics."""
+        storage = type(self).__name__
+        FILE_PARSES.inc(storage=storage, mode=mode)
+        BYTES_READ.inc(sum(state[1] for state in signature if state), storage=storage)
+
+    def _iter_file(self):
+        """
+        Yields (title, MovieRecord) tuples from the data file. Formats that can be read
+        incrementally override this, the others override _read_file instead.
+        """
+        yield from self._read_file().items()
+
+    @abstractmethod
+    def _write_file(self, movies):
+        """Writes all movies to the data file, returns True on success."""
+
+    def load_movies(self):
+        """
+        Returns all movies as a dictionary keyed by title.
+
+        The returned dictionary is the shared in-memory copy, callers must not modify it.
+        """
+        signature = self._file_signature()
+        if self._movies is None or signature != self._signature:
+            CACHE_MISSES.inc(cache="catalog")
+            # Writers hold the lock exclusively, so the data file and journal are read in a consistent state
+            with self._file_lock.shared():
+                signature = self._file_signature()
+                movies = self._read_file()
+                self._replay_journal(movies)
+            self._count_read(signature, "load")
+            self._build_index(movies)
+            self._movies = movies
+            self._signature = signature
+        else:
+            CACHE_HITS.inc(cache="catalog")
+        return self._movies
+
+    def data_version(self):
+        """Returns the (mtime, size) state of the data file and its journal."""
+        return self._file_signature()
+
+    def get_movie(self, imdb_id):
+        """Returns (title, movie) for the given IMDb ID or None if it is not in the database."""
+        movies = self.load_movies()
+        titles = self._by_imdb_id.get(imdb_id)
+        if not titles:
+            return None
+        return titles[0], movies[titles[0]]
+
+    def _find_title(self, title):
+        """Returns the stored title matching the given title after normalization, or None."""
+        self.load_movies()
+        return self._by_title.get(normalize_title(title))
+
+    def _build_index(self, movies):
+        """Builds the imdbID and title indexes and the rating aggregates from scratch."""
+        self._by_imdb_id = {}
+        self._by_title = {}
+        self._aggregates = RatingAggregates()
+        self._search_index = None  # Built on the first search, see _get_search_index
+        self._sorted_indexes = {}  # field -> SortedIndex, built on first use
+        for title, movie in movies.items():
+            self._index_movie(title, movie)
+
+    def _index_movie(self, title, movie):
+        self._by_imdb_id.setdefault(movie.get("imdbID"), []).append(title)
+        self._by_title[normalize_title(title)] = title
+        self._aggregates.add(title, movie)
+        if self._search_index is not None:
+            self._search_index.add(title)
+        for index in self._sorted_indexes.values():
+            index.add(title, movie)
+
+    def _unindex_movie(self, title, movie):
+        titles = self._by_imdb_id.get(movie.get("imdbID"), [])
+        if title in titles:
+            titles.remove(title)
+            if not titles:
+                del self._by_imdb_id[movie.get("imdbID")]
+        if self._by_title.get(normalize_title(title)) == title:
+            del self._by_title[normalize_title(title)]
+        self._aggregates.remove(title, movie)
+        if self._search_index is not None:
+            self._search_index.remove(title)
+        for index in self._sorted_indexes.values():
+            index.remove(title, movie)
+
+    def _get_search_index(self):
+        """Returns the title search index, built on first use and then kept current by every mutation."""
+        movies = self.load_movies()
+        if self._search_index is None:
+            self._search_index = SearchIndex(movies)
+        return self._search_index
+
+    def _get_sorted_index(self, field):
+        """Returns the sorted index for the field, built on first use and then kept current by every mutation."""
+        movies = self.load_movies()
+        if field not in self._sorted_indexes:
+            self._sorted_indexes[field] = SortedIndex(field, movies)
+        return self._sorted_indexes[field]
+
+    def query_movies(self, title=None, min_rating=None, year_from=None, year_to=None,
+                     sort=None, descending=False, offset=0, limit=50):
+        """
+        Returns one page of movies (see IStorage.query_movies). Sorted pages come from the sorted
+        indexes: a range on the sort field is found by bisection, ranges on the other numeric
+        field are looked up in its index. Ties are ordered by title. Queries with a title filter
+        or without sort scan the catalog.
+        """
+        if sort is None or title or sort not in SORT_FIELDS:
+            return super().query_movies(title, min_rating, year_from, year_to, sort, descending, offset, limit)
+        movies = self.load_movies()
+        ranges = {"rating": (min_rating, None), "year": (year_from, year_to)}
+        low, high = ranges.pop(sort, (None, None))
+        index = self._get_sorted_index(sort)
+
+        matches = None  # Titles within the ranges on the other fields
+        for field, (field_low, field_high) in ranges.items():
+            if field_low is not None or field_high is not None:
+                titles = set(self._get_sorted_index(field).titles(low=field_low, high=field_high))
+                matches = titles if matches is None else matches & titles
+        if matches is None:
+            total = index.count(low, high)
+            page = index.titles(descending, offset, limit, low, high)
+        else:
+            # Sorting the matches costs about 16 times more per title than walking the index
+            if len(matches) * 16 < index.count(low, high):
+                ordered = index.sort_titles(matches, movies, descending, low, high)
+            else:
+                ordered = [title for title in index.titles(descending, low=low, high=high) if title in matches]
+            total, page = len(ordered), ordered[offset:offset + limit]
+        return total, [(title, movies[title]) for title in page]
+
+    def movie_stats(self):
+        """
+        Returns the running rating statistics. If the catalog is not loaded (or changed on disk),
+        the summary persisted for the current file state is used instead of parsing the file.
+        """
+        signature = self._file_signature()
+        if self._movies is None or signature != self._signature:
+            summary = load_summary(self.stats_filename, signature)
+            if summary is not False:
+                CACHE_HITS.inc(cache="stats")
+                return summary
+            CACHE_MISSES.inc(cache="stats")
+            self.load_movies()
+        summary = self._aggregates.summary()
+        if self._stats_signature != self._signature:
+            self._save_stats(summary)  # Only when read, mutations just update the aggregates
+        return summary
+
+    def _save_stats(self, summary=None):
+        """Persists the statistics summary for the current file state, unless it already is."""
+        if self._stats_signature == self._signature:
+            return
+        save_summary(self.stats_filename, self._signature,
+                     summary if summary is not None else self._aggregates.summary())
+        self._stats_signature = self._signature
+
+    def _mark_written(self, success=True):
+        """Remembers the file state after a write so our own writes don't trigger a reload."""
+        if success:
+            self._signature = self._file_signature()
+        else:
+            self._movies = None  # The file may not match the cache any more, re-read next time
+            self._signature = None
+
+    @staticmethod
+    def _apply_entry(movies, entry):
+        """Applies a single journal entry to the movies dictionary."""
+        title = entry["title"]
+        if entry["op"] == "add":
+            movies[title] = MovieRecord.from_dict(entry["movie"])
+        elif entry["op"] == "update":
+            if title in movies:
+                movies[title].update(entry["movie"])
+        elif entry["op"] == "delete":
+            movies.pop(title, None)
+
+    def _journal_entries(self):
+        """Yields the entries of the journal in the order they were written."""
+        try:
+            with open(self.journal_filename, "r", encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from an interrupted append, everything before it is valid
+                        print(f"Warning: Skipping damaged entry in {self.journal_filename}.")
+                        continue
+                    yield entry
+        except FileNotFoundError:
+            pass
+        except IOError as e:
+            print(f"Error reading journal: {e}")
+
+    def _replay_journal(self, movies):
+        """Replays the journal over the movies read from the data file."""
+        for entry in self._journal_entries():
+            self._apply_entry(movies, entry)
+
+    def iter_movies(self):
+        """
+        Yields (title, movie) tuples in the same order as load_movies().
+
+        If the catalog isn't loaded, the data file is streamed and the journal is applied on
+        the fly, so memory is bounded by the journal (at most about journal_limit bytes)
+        instead of the catalog.
+        """
+        if self._movies is not None and self._file_signature() == self._signature:
+            yield from self._movies.items()
+            return
+
+        self._count_read(self._file_signature(), "stream")
+        pending = {}  # title -> journal entries, ordered like the titles end up in load_movies()
+        for entry in self._journal_entries():
+            title = entry["title"]
+            entries = pending.get(title)
+            if entry["op"] == "add" and entries and self._is_deleted(entries):
+                pending[title] = pending.pop(title)  # Added again after a delete, moves to the end
+            pending.setdefault(title, []).append(entry)
+
+        for title, movie in self._iter_file():
+            entries = pending.get(title)
+            if entries is None:
+                yield title, movie
+            elif not any(entry["op"] == "delete" for entry in entries):
+                del pending[title]
+                movies = {title: movie}
+                for entry in entries:
+                    self._apply_entry(movies, entry)
+                yield title, movies[title]
+            # Deleted movies are left to the journal, which re-adds them at the end if needed
+
+        for title, entries in pending.items():
+            movies = {}
+            for entry in entries:
+                self._apply_entry(movies, entry)
+            if title in movies:
+                yield title, movies[title]
+
+    @staticmethod
+    def _is_deleted(entries):
+        """Returns True if the last add or delete among the journal entries of a title is a delete."""
+        for entry in reversed(entries):
+            if entry["op"] in ("add", "delete"):
+                return entry["op"] == "delete"
+        return False
+
+    def count_movies(self):
+        """Returns the number of movies, streaming the file if the catalog isn't loaded."""
+        if self._movies is not None and self._file_signature() == self._signature:
+            return len(self._movies)
+        return super().count_movies()
+
+    def _log_mutation(self, op, title, movie=None):
+        """Appends a single add/update/delete entry to the journal, see _log_mutations."""
+        entry = {"op": op, "title": title}
+        if movie is not None:
+            entry["movie"] = movie
+        return self._log_mutations([entry])
+
+    def _log_mutations(self, entries):
+        """
+        Appends journal entries in one write and applies them to the in-memory copy.
+
+        Replaying an entry twice gives the same result, so a crash during compaction
+        (data file written, journal not yet removed) is harmless.
+        """
+        with self._file_lock.exclusive():
+            movies = self.load_movies()  # Picks up changes other processes made before we got the lock
+            data = "".join(json.dumps(entry) + "\n" for entry in entries)
+            try:
+                with open(self.journal_filename, "a", encoding="utf-8") as journal:
+                    journal.write(data)
+                    journal.flush()
+                    os.fsync(journal.fileno())
+            except IOError as e:
+                print(f"Error writing to journal: {e}")
+                STORAGE_ERRORS.inc(storage=type(self).__name__, operation="journal_write")
+                self._mark_written(success=False)
+                return False
+            BYTES_WRITTEN.inc(len(data.encode("utf-8")), storage=type(self).__name__)
+
+            for entry in entries:
+                title = entry["title"]
+                if title in movies:
+                    self._unindex_movie(title, movies[title])
+                self._apply_entry(movies, entry)
+                if title in movies:
+                    self._index_movie(title, movies[title])
+            self._mark_written()
+
+            journal_state = self._signature[1]
+            if journal_state and journal_state[1] > self.journal_limit:
+                self.compact()
+            return True
+
+    @staticmethod
+    def _make_movie(rating, year, poster_url, imdbID):
+        """Returns the movie as written to the journal, with the rating and year already parsed."""
+        return MovieRecord(rating, year, poster_url, imdbID).to_dict()
+
+    @abstractmethod
+    def _is_duplicate(self, title, imdbID):
+        """Returns True if the movie is already in the database."""
+
+    def add_movies(self, movies):
+        """
+        Adds several movies with a single journal write, skipping duplicates.
+
+        Movies are dictionaries with the keys title, rating, year, poster_url and imdbID.
+        Returns the list of added titles. The file lock is taken once for the whole batch.
+        """
+        with self._file_lock.exclusive():
+            self.load_movies()
+            entries = []
+            seen_ids = set()
+            seen_titles = set()
+            for movie in movies:
+                title, imdb_id = movie["title"], movie["imdbID"]
+                if self._is_duplicate(title, imdb_id) or imdb_id in seen_ids or normalize_title(title) in seen_titles:
+                    print(f"Movie '{title}' is already in the database.")
+                    continue
+                seen_ids.add(imdb_id)
+                seen_titles.add(normalize_title(title))
+                entries.append({
+                    "op": "add",
+                    "title": title,
+                    "movie": self._make_movie(movie["rating"], movie["year"], movie["poster_url"], imdb_id),
+                })
+
+            if entries and not self._log_mutations(entries):
+                return []
+            return [entry["title"] for entry in entries]
+
+    def update_movies(self, changes):
+        """
+        Updates several movies with a single journal write, see IStorage.update_movies.
+        The file lock is taken once for the whole batch.
+        """
+        with self._file_lock.exclusive():
+            movies = self.load_movies()
+            entries = []
+            for title, fields in changes.items():
+                fields = {key: value for key, value in fields.items() if key in UPDATE_FIELDS}
+                if title in movies and fields:
+                    entries.append({"op": "update", "title": title, "movie": fields})
+
+            if entries and not self._log_mutations(entries):
+                return []
+            return [entry["title"] for entry in entries]
+
+    def compact(self):
+        """Folds the journal back into the data file."""
+        with self._file_lock.exclusive():
+            movies = self.load_movies()
+            if not self._write_file(movies):
+                STORAGE_ERRORS.inc(storage=type(self).__name__, operation="compact_write")
+                return False
+            BYTES_WRITTEN.inc((self._stat(self.filename) or (0, 0))[1], storage=type(self).__name__)
+            try:
+                os.remove(self.journal_filename)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error removing journal: {e}")
+            self._mark_written()
+            self._save_stats()
+            return True
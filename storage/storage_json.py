@@ -1,23 +1,29 @@
 import json
 import os
-from storage.istorage import IStorage
+from storage.movie_record import MovieRecord
+from storage.safe_io import atomic_write
+from storage.storage_file import StorageFile, JOURNAL_LIMIT
 
-class StorageJson(IStorage):
-    def __init__(self, filename):
-        self.filename = filename
+class StorageJson(StorageFile):
+    def __init__(self, filename, journal_limit=JOURNAL_LIMIT):
+        super().__init__(filename, journal_limit)
         if not os.path.exists(self.filename):
-            self._save_movies({})  # Initialize with an empty dictionary if the file does not exist
+            self._write_file({})  # Initialize with an empty dictionary if the file does not exist
 
-    def _save_movies(self, movies):
-        """Saves movie data to the JSON file."""
+    def _write_file(self, movies):
+        """Saves movie data to a new JSON file that replaces the old one."""
         try:
-            with open(self.filename, 'w', encoding='utf-8') as file:
-                json.dump(movies, file, indent=4)
+            with atomic_write(self.filename, encoding='utf-8') as file:
+                json.dump({title: movie.to_dict() for title, movie in movies.items()}, file, indent=4)
+            self._mark_written()
+            return True
         except IOError as e:
             print(f"Error saving to file {self.filename}: {e}")
+            self._mark_written(success=False)
+            return False
 
-    def load_movies(self):
-        """Loads all movies from the JSON file."""
+    def _read_file(self):
+        """Parses the JSON file and returns the movies as a dictionary."""
         movies = {}
         try:
             with open(self.filename, 'r', encoding='utf-8') as jsonfile:
@@ -25,6 +31,7 @@ class StorageJson(IStorage):
                 if not isinstance(movies, dict):  # If the JSON file is not in the expected format
                     print("Warning: JSON file is not in the expected format. Resetting movies list.")
                     movies = {}
+                movies = {title: MovieRecord.from_dict(movie) for title, movie in movies.items()}
         except FileNotFoundError:
             print("JSON file not found. Creating a new movie list.")
             movies = {}  # Initialize with an empty dictionary
@@ -35,52 +42,55 @@ class StorageJson(IStorage):
 
     def list_movies(self):
         """Prints the list of movies when explicitly requested by the user."""
-        movies = self.load_movies()
-        if movies:
-            print("Movies in the database:")
-            for index, (title, data) in enumerate(movies.items(), start=1):
-                print(
-                    f"{index}. {title}, Rating: {data['rating']}, Year: {data['year']}, Poster URL: {data['poster_url']}, IMDb Link: {data['imdbID']}")
-        else:
+        index = 0
+        for index, (title, data) in enumerate(self.iter_movies(), start=1):
+            if index == 1:
+                print("Movies in the database:")
+            print(
+                f"{index}. {title}, Rating: {data['rating']}, Year: {data['year']}, Poster URL: {data['poster_url']}, IMDb Link: {data['imdbID']}")
+        if not index:
             print("No movies found.")
 
+    def _is_duplicate(self, title, imdbID):
+        """A movie is a duplicate if its IMDb ID is already in the database."""
+        return self.get_movie(imdbID) is not None
+
     def add_movie(self, title, rating, year, poster_url, imdbID):
         """Adds a new movie to the JSON file if it does not already exist."""
-        movies = self.load_movies()
-
-        # Check if the movie already exists (by IMDb ID)
-        if any(movie.get("imdbID") == imdbID for movie in movies.values()):
-            print(f"Movie '{title}' is already in the database.")
-            return False  # Return False if the movie is already in the database
+        with self._file_lock.exclusive():
+            # Check if the movie already exists (by IMDb ID)
+            if self._is_duplicate(title, imdbID):
+                print(f"Movie '{title}' is already in the database.")
+                return False  # Return False if the movie is already in the database
 
-        # Add the movie if it does not exist yet
-        movies[title] = {
-            "year": year,
-            "rating": rating,
-            "poster_url": poster_url,
-            "imdbID": imdbID,
-        }
-        self._save_movies(movies)
-        print(f"Movie '{title}' ({year}) with rating {rating} was added successfully.")
-        return True  # Return True after successfully adding the movie
+            # Add the movie if it does not exist yet
+            if not self._log_mutation("add", title, self._make_movie(rating, year, poster_url, imdbID)):
+                return False
+            print(f"Movie '{title}' ({year}) with rating {rating} was added successfully.")
+            return True  # Return True after successfully adding the movie
 
     def delete_movie(self, title):
         """Deletes a movie by its title."""
-        movies = self.load_movies()
-        if title in movies:
-            del movies[title]
-            self._save_movies(movies)
-            print(f"Movie '{title}' deleted successfully.")
-        else:
-            print(f"The movie '{title}' was not found.")
+        with self._file_lock.exclusive():
+            movies = self.load_movies()
+            if title in movies:
+                if not self._log_mutation("delete", title):
+                    return False
+                print(f"Movie '{title}' deleted successfully.")
+                return True
+            else:
+                print(f"The movie '{title}' was not found.")
+                return False
 
     def update_movie(self, title, rating, poster_url):
         """Updates the rating, poster URL, and IMDb link of a movie."""
-        movies = self.load_movies()
-        if title in movies:
-            movies[title]['rating'] = rating
-            movies[title]['poster_url'] = poster_url
-            self._save_movies(movies)
-            print(f"Movie '{title}' updated successfully.")
-        else:
-            print(f"The movie '{title}' was not found.")
+        with self._file_lock.exclusive():
+            movies = self.load_movies()
+            if title in movies:
+                if not self._log_mutation("update", title, {"rating": rating, "poster_url": poster_url}):
+                    return False
+                print(f"Movie '{title}' updated successfully.")
+                return True
+            else:
+                print(f"The movie '{title}' was not found.")
+                return False
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+from storage.movie_record import MovieRecord
+from storage.safe_io import atomic_write
+from storage.storage_json import StorageJson
+
+
+def write_movies(filename, movies):
+    """Writes (title, movie) tuples to a JSON Lines file one line at a time, returns the number written."""
+    count = 0
+    with atomic_write(filename, encoding='utf-8') as file:
+        for title, movie in movies:
+            file.write(json.dumps({"title": title, **movie}) + "\n")
+            count += 1
+    return count
+
+
+class StorageJsonl(StorageJson):
+    """
+    Stores the movies in a JSON Lines file (movies.jsonl), one movie object per line.
+
+    Unlike movies.json the file can be read line by line, so iter_movies() streams even
+    multi-GB catalogs in constant memory. Adding, updating and deleting work like StorageJson.
+    """
+
+    def _write_file(self, movies):
+        """Writes all movies to the JSON Lines file."""
+        try:
+            write_movies(self.filename, movies.items())
+            self._mark_written()
+            return True
+        except IOError as e:
+            print(f"Error saving to file {self.filename}: {e}")
+            self._mark_written(success=False)
+            return False
+
+    def _read_file(self):
+        """Parses the JSON Lines file and returns the movies as a dictionary."""
+        return dict(self._iter_file())
+
+    def _iter_file(self):
+        """Streams the JSON Lines file line by line as (title, MovieRecord) tuples."""
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as file:
+                for number, line in enumerate(file, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        movie = json.loads(line)
+                        title = movie["title"]
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        print(f"Warning: Skipping damaged line {number} in {self.filename}.")
+                        continue
+                    yield title, MovieRecord.from_dict(movie)
+        except FileNotFoundError:
+            print("JSON Lines file not found.")
+        except IOError as e:
+            print(f"Error reading JSON Lines file: {e}")
+
+
+def export_movies(source_path, target_path):
+    """Exports a movie file of any format to JSON Lines, streaming the movies in one pass."""
+    from storage.formats import open_storage  # formats imports this module
+    if not os.path.exists(source_path):
+        print(f"File {source_path} not found.")
+        return 0
+    try:
+        source = open_storage(source_path)
+    except ValueError as e:
+        print(e)
+        return 0
+    try:
+        exported = write_movies(target_path, source.iter_movies())
+    except IOError as e:
+        print(f"Error writing {target_path}: {e}")
+        return 0
+    print(f"Exported {exported} movies from {source_path} to {target_path}.")
+    return exported
+
+
+if __name__ == "__main__":
+    # Usage: python -m storage.storage_jsonl data/movies.csv data/movies.jsonl
+    if len(sys.argv) != 3:
+        print("Usage: python -m storage.storage_jsonl <movies.csv|movies.json|movies.db|movies.bin> <movies.jsonl>")
+        sys.exit(1)
+    export_movies(sys.argv[1], sys.argv[2])
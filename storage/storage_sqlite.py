@@ -0,0 +1,371 @@
+import os
+import sqlite3
+import sys
+import threading
+from storage.istorage import HISTOGRAM_BINS, IStorage, PERCENTILES, RATING_RANGE, SORT_FIELDS, UPDATE_FIELDS
+from storage.movie_record import MovieRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    title TEXT PRIMARY KEY,
+    rating REAL,
+    year INTEGER,
+    poster_url TEXT,
+    imdbID TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_movies_imdbID ON movies (imdbID);
+CREATE INDEX IF NOT EXISTS idx_movies_year ON movies (year);
+CREATE INDEX IF NOT EXISTS idx_movies_rating ON movies (rating);
+"""
+
+# Ratings stored as numbers, anything else (e.g. 'N/A') is treated as invalid by the stats
+NUMERIC_RATING = "typeof(rating) IN ('real', 'integer')"
+
+
+def like_pattern(query):
+    """Returns a LIKE pattern matching titles that contain the query literally."""
+    return "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class StorageSqlite(IStorage):
+    """Stores the movies in an indexed SQLite database running in WAL mode."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()  # The connection is shared between Flask's threads
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def data_version(self):
+        """
+        Combines SQLite's data_version, which changes on commits from other connections,
+        with the number of changes made through this connection.
+        """
+        with self._lock:
+            version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            return version, self._connection.total_changes
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _to_movie(row):
+        """Converts a (rating, year, poster_url, imdbID) row into a MovieRecord."""
+        return MovieRecord(*row)
+
+    def load_movies(self):
+        """Loads all movies from the database in insertion order."""
+        rows = self._query("SELECT title, rating, year, poster_url, imdbID FROM movies ORDER BY rowid")
+        return {row[0]: self._to_movie(row[1:]) for row in rows}
+
+    def iter_movies(self, batch_size=1000):
+        """Yields (title, movie) tuples in insertion order, reading batch_size rows per query."""
+        last_rowid = 0
+        while True:
+            rows = self._query(
+                "SELECT rowid, title, rating, year, poster_url, imdbID FROM movies WHERE rowid > ? "
+                "ORDER BY rowid LIMIT ?", (last_rowid, batch_size))
+            for row in rows:
+                yield row[1], self._to_movie(row[2:])
+            if len(rows) < batch_size:
+                return
+            last_rowid = rows[-1][0]
+
+    def _titles(self):
+        """Returns the titles in insertion order, without reading the other columns."""
+        return [row[0] for row in self._query("SELECT title FROM movies ORDER BY rowid")]
+
+    def _movies_with_titles(self, titles):
+        """Returns {title: movie} for the given titles that are stored, looked up by the title index."""
+        if not titles:
+            return {}
+        rows = self._query(
+            f"SELECT title, rating, year, poster_url, imdbID FROM movies "
+            f"WHERE title IN ({', '.join('?' * len(titles))})", list(titles))
+        return {row[0]: self._to_movie(row[1:]) for row in rows}
+
+    def count_movies(self):
+        """Returns the number of movies."""
+        return self._query("SELECT COUNT(*) FROM movies")[0][0]
+
+    def get_movie(self, imdb_id):
+        """Returns (title, movie) for the given IMDb ID or None if it is not in the database."""
+        rows = self._query(
+            "SELECT title, rating, year, poster_url, imdbID FROM movies WHERE imdbID = ? LIMIT 1", (imdb_id,))
+        if not rows:
+            return None
+        return rows[0][0], self._to_movie(rows[0][1:])
+
+    def list_movies(self):
+        """Prints the list of movies when explicitly requested by the user."""
+        movies = self.load_movies()
+        if movies:
+            print("Movies in the database:")
+            for index, (title, data) in enumerate(movies.items(), start=1):
+                print(
+                    f"{index}. {title}, Rating: {data['rating']}, Year: {data['year']}, Poster URL: {data['poster_url']}, IMDb Link: {data['imdbID']}")
+        else:
+            print("No movies found.")
+
+    def add_movie(self, title, rating, year, poster_url, imdbID):
+        """Adds a new movie to the database if no movie with the same title or IMDb ID exists."""
+        try:
+            with self._lock, self._connection:
+                duplicate = self._connection.execute(
+                    "SELECT 1 FROM movies WHERE imdbID = ? OR title = ? LIMIT 1", (imdbID, title)).fetchone()
+                if duplicate:
+                    print(f"Movie '{title}' is already in the database.")
+                    return False
+                self._connection.execute(
+                    "INSERT INTO movies (title, rating, year, poster_url, imdbID) VALUES (?, ?, ?, ?, ?)",
+                    (title, rating, year, poster_url, imdbID))
+        except sqlite3.Error as e:
+            print(f"Error adding movie: {e}")
+            return False
+
+        print(f"Movie '{title}' ({year}) with rating {rating} was added successfully.")
+        return True
+
+    def add_movies(self, movies):
+        """
+        Adds several movies in one transaction, skipping duplicates by title or IMDb ID.
+
+        Movies are dictionaries with the keys title, rating, year, poster_url and imdbID.
+        Returns the list of added titles.
+        """
+        added = []
+        try:
+            with self._lock, self._connection:
+                for movie in movies:
+                    title, imdb_id = movie["title"], movie["imdbID"]
+                    duplicate = self._connection.execute(
+                        "SELECT 1 FROM movies WHERE imdbID = ? OR title = ? LIMIT 1", (imdb_id, title)).fetchone()
+                    if duplicate:
+                        print(f"Movie '{title}' is already in the database.")
+                        continue
+                    self._connection.execute(
+                        "INSERT INTO movies (title, rating, year, poster_url, imdbID) VALUES (?, ?, ?, ?, ?)",
+                        (title, movie["rating"], movie["year"], movie["poster_url"], imdb_id))
+                    added.append(title)
+        except sqlite3.Error as e:
+            print(f"Error adding movies: {e}")
+            return []
+        return added
+
+    def import_movies(self, movies):
+        """
+        Inserts (title, movie) tuples, e.g. from another storage's iter_movies(), in one
+        transaction, skipping titles that already exist. The rows are streamed into SQLite.
+        """
+        rows = ((title, movie.get("rating"), movie.get("year"), movie.get("poster_url"), movie.get("imdbID"))
+                for title, movie in movies)
+        try:
+            with self._lock, self._connection:
+                before = self._connection.total_changes
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO movies (title, rating, year, poster_url, imdbID) VALUES (?, ?, ?, ?, ?)",
+                    rows)
+                return self._connection.total_changes - before
+        except sqlite3.Error as e:
+            print(f"Error importing movies: {e}")
+            return 0
+
+    def delete_movie(self, title):
+        """Deletes a movie by its title."""
+        try:
+            with self._lock, self._connection:
+                deleted = self._connection.execute("DELETE FROM movies WHERE title = ?", (title,)).rowcount
+        except sqlite3.Error as e:
+            print(f"Error deleting movie: {e}")
+            return False
+
+        if deleted:
+            print(f"Movie '{title}' deleted successfully.")
+            return True
+        print(f"The movie '{title}' was not found.")
+        return False
+
+    def update_movie(self, title, rating, poster_url):
+        """Updates the rating and poster URL of a movie."""
+        try:
+            with self._lock, self._connection:
+                updated = self._connection.execute(
+                    "UPDATE movies SET rating = ?, poster_url = ? WHERE title = ?",
+                    (rating, poster_url, title)).rowcount
+        except sqlite3.Error as e:
+            print(f"Error updating movie: {e}")
+            return False
+
+        if updated:
+            print(f"Movie '{title}' updated successfully.")
+            return True
+        print(f"The movie '{title}' was not found.")
+        return False
+
+    def update_movies(self, changes):
+        """Updates several movies in one transaction, see IStorage.update_movies."""
+        updated = []
+        try:
+            with self._lock, self._connection:
+                for title, fields in changes.items():
+                    fields = {key: value for key, value in fields.items() if key in UPDATE_FIELDS}
+                    if not fields:
+                        continue
+                    assignments = ", ".join(f"{key} = ?" for key in fields)
+                    if self._connection.execute(f"UPDATE movies SET {assignments} WHERE title = ?",
+                                                (*fields.values(), title)).rowcount:
+                        updated.append(title)
+        except sqlite3.Error as e:
+            print(f"Error updating movies: {e}")
+            return []
+        return updated
+
+    def search_movies(self, query):
+        """Returns all movies whose title contains the query (case-insensitive)."""
+        rows = self._query(
+            "SELECT title, rating, year, poster_url, imdbID FROM movies "
+            "WHERE title LIKE ? ESCAPE '\\' ORDER BY rowid", (like_pattern(query),))
+        return {row[0]: self._to_movie(row[1:]) for row in rows}
+
+    def sorted_movies(self, field="rating", descending=False, offset=0, limit=None, low=None, high=None):
+        """Returns (title, movie) tuples ordered by field (see IStorage.sorted_movies) using the column indexes."""
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Can't sort by '{field}', use one of {', '.join(SORT_FIELDS)}.")
+        order = "DESC" if descending else "ASC"
+        conditions, params = [], []
+        if field == "title":
+            column, order_by = "title COLLATE NOCASE", f"title COLLATE NOCASE {order}, title {order}"
+        else:
+            # Movies without a numeric value are sorted last and left out of ranges
+            numeric = NUMERIC_RATING if field == "rating" else "typeof(year) = 'integer'"
+            column, order_by = field, f"{numeric} DESC, {field} {order}, title {order}"
+            if low is not None or high is not None:
+                conditions.append(numeric)
+        if low is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append(f"{column} <= ?")
+            params.append(high)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._query(
+            f"SELECT title, rating, year, poster_url, imdbID FROM movies {where} ORDER BY {order_by} "
+            f"LIMIT ? OFFSET ?", params + [-1 if limit is None else limit, offset])
+        return [(row[0], self._to_movie(row[1:])) for row in rows]
+
+    def query_movies(self, title=None, min_rating=None, year_from=None, year_to=None,
+                     sort=None, descending=False, offset=0, limit=50):
+        """Returns one page of matching movies (see IStorage.query_movies) using SQL LIMIT/OFFSET."""
+        if sort is not None and sort not in SORT_FIELDS:
+            raise ValueError(f"Can't sort by '{sort}', use one of {', '.join(SORT_FIELDS)}.")
+
+        conditions, params = [], []
+        if title:
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            params.append(like_pattern(title))
+        if min_rating is not None:
+            conditions.append(f"{NUMERIC_RATING} AND rating >= ?")
+            params.append(min_rating)
+        # Text like 'N/A' sorts above every number in SQLite, so non-numeric years are excluded explicitly
+        if year_from is not None:
+            conditions.append("typeof(year) = 'integer' AND year >= ?")
+            params.append(year_from)
+        if year_to is not None:
+            conditions.append("typeof(year) = 'integer' AND year <= ?")
+            params.append(year_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        order = "DESC" if descending else "ASC"
+        if sort is None:
+            order_by = "rowid"
+        elif sort == "title":
+            order_by = f"title COLLATE NOCASE {order}, title {order}"
+        else:
+            # Movies without a numeric value are sorted last, ties are ordered by title like StorageFile
+            numeric = NUMERIC_RATING if sort == "rating" else "typeof(year) = 'integer'"
+            order_by = f"{numeric} DESC, {sort} {order}, title {order}"
+
+        total = self._query(f"SELECT COUNT(*) FROM movies {where}", params)[0][0]
+        rows = self._query(
+            f"SELECT title, rating, year, poster_url, imdbID FROM movies {where} "
+            f"ORDER BY {order_by} LIMIT ? OFFSET ?", params + [limit, offset])
+        return total, [(row[0], self._to_movie(row[1:])) for row in rows]
+
+    def movie_stats(self):
+        """Returns rating statistics (see aggregates.RatingAggregates.summary) computed by SQL queries."""
+        count, average, best_rating, worst_rating = self._query(
+            f"SELECT COUNT(*), AVG(rating), MAX(rating), MIN(rating) FROM movies WHERE {NUMERIC_RATING}")[0]
+        if not count:
+            return None
+
+        # Median and percentiles are read from the rating index instead of sorting all ratings
+        median = self._rating_percentile(50, count)
+        percentiles = {str(p): self._rating_percentile(p, count) for p in PERCENTILES}
+        per_year = [{"year": year, "count": year_count, "average": year_average}
+                    for year, year_count, year_average in self._query(
+                        f"SELECT year, COUNT(*), AVG(rating) FROM movies "
+                        f"WHERE {NUMERIC_RATING} AND typeof(year) = 'integer' AND year > 0 "
+                        f"GROUP BY year ORDER BY year")]
+
+        low, high = RATING_RANGE
+        histogram = [0] * HISTOGRAM_BINS
+        for index, bin_count in self._query(
+                f"SELECT MIN(MAX(CAST((rating - ?) / ? * ? AS INTEGER), 0), ?) AS bin, COUNT(*) "
+                f"FROM movies WHERE {NUMERIC_RATING} GROUP BY bin",
+                (low, high - low, HISTOGRAM_BINS, HISTOGRAM_BINS - 1)):
+            histogram[index] = bin_count
+
+        def titles_with(rating):
+            return [row[0] for row in self._query("SELECT title FROM movies WHERE rating = ? ORDER BY rowid", (rating,))]
+
+        invalid = [row[0] for row in self._query(f"SELECT title FROM movies WHERE NOT {NUMERIC_RATING}")]
+        return {
+            "count": count,
+            "average": average,
+            "median": median,
+            "percentiles": percentiles,
+            "best_rating": best_rating,
+            "best_movies": titles_with(best_rating),
+            "worst_rating": worst_rating,
+            "worst_movies": titles_with(worst_rating),
+            "invalid": invalid,
+            "per_year": per_year,
+            "histogram": histogram,
+        }
+
+    def _rating_percentile(self, percentile, count):
+        """Returns the percentile of the valid ratings with linear interpolation (like numpy.percentile)."""
+        position = percentile / 100 * (count - 1)
+        lower = int(position)
+        rows = self._query(
+            f"SELECT rating FROM movies WHERE {NUMERIC_RATING} ORDER BY rating LIMIT 2 OFFSET ?", (lower,))
+        if len(rows) == 1:
+            return rows[0][0]
+        return rows[0][0] + (rows[1][0] - rows[0][0]) * (position - lower)
+
+
+def migrate(source_path, database_path):
+    """Imports an existing movies.csv, .json, .jsonl or .bin file into a SQLite database."""
+    from storage.formats import open_storage  # formats imports this module
+    if not os.path.exists(source_path):
+        print(f"File {source_path} not found.")
+        return 0
+    try:
+        source = open_storage(source_path)
+    except ValueError as e:
+        print(e)
+        return 0
+    imported = StorageSqlite(database_path).import_movies(source.iter_movies())
+    print(f"Imported {imported} movies from {source_path} into {database_path}.")
+    return imported
+
+
+if __name__ == "__main__":
+    # Usage: python -m storage.storage_sqlite data/movies.csv data/movies.db
+    if len(sys.argv) != 3:
+        print("Usage: python -m storage.storage_sqlite <movies.csv|movies.json|movies.jsonl|movies.bin> <movies.db>")
+        sys.exit(1)
+    migrate(sys.argv[1], sys.argv[2])
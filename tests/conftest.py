@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+
+# The modules live in the repository root (e.g. omdb_client.py), make them importable from the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeOmdb:
+    """
+    A local stand-in for the OMDb API. Answers from movies (IMDb ID -> OMDb response), looked up
+    by i= or t=, after first sending the scripted (status, headers, body) answers in order.
+    """
+
+    def __init__(self):
+        self.movies = {}
+        self.script = []
+        self.requests = []  # The query parameters of every request
+        self._lock = threading.Lock()
+
+    def add(self, imdb_id, title, rating="7.5", year="2000", poster="N/A"):
+        self.movies[imdb_id] = {"Title": title, "imdbRating": rating, "Year": year, "Poster": poster,
+                                "imdbID": imdb_id, "Response": "True"}
+
+    def answer(self, params):
+        with self._lock:
+            self.requests.append(params)
+            if self.script:
+                return self.script.pop(0)
+        if "i" in params:
+            movie = self.movies.get(params["i"])
+        else:
+            movie = next((movie for movie in self.movies.values()
+                          if movie["Title"].lower() == params.get("t", "").lower()), None)
+        if movie is None:
+            return 200, {}, {"Response": "False", "Error": "Movie not found!"}
+        return 200, {}, movie
+
+
+def start_server(answer):
+    """
+    Runs a local HTTP server on a free port in a daemon thread. answer(path) returns the
+    (status, headers, body) of a GET request. Returns the server and its base URL.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, headers, body = answer(self.path)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def stop_server(server):
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def omdb_server():
+    """Runs a FakeOmdb on a free local port, its base_url is passed to OmdbClient."""
+    fake = FakeOmdb()
+
+    def answer(path):
+        params = {name: values[0] for name, values in parse_qs(urlparse(path).query).items()}
+        status, headers, body = fake.answer(params)
+        payload = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        return status, {"Content-Type": "application/json", **headers}, payload
+
+    server, fake.base_url = start_server(answer)
+    try:
+        yield fake
+    finally:
+        stop_server(server)
@@ -0,0 +1,22 @@
+import pytest
+import app as web
+
+
+@pytest.fixture
+def client():
+    return web.app.test_client()
+
+
+def test_limit_zero_is_rejected(client):
+    assert client.get("/api/movies?limit=0").status_code == 400
+    assert client.get("/api/search?q=matrix&limit=0").status_code == 400
+
+
+def test_limit_defaults_to_the_page_size():
+    assert web.parse_query({})["limit"] == web.PAGE_SIZE
+    assert web.parse_query({"limit": ""})["limit"] == web.PAGE_SIZE
+
+
+@pytest.mark.parametrize("limit", ["-1", str(web.MAX_PAGE_SIZE + 1), "many"])
+def test_bad_limits_are_rejected(client, limit):
+    assert client.get(f"/api/movies?limit={limit}").status_code == 400
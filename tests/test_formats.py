@@ -0,0 +1,30 @@
+import pytest
+from storage.formats import open_storage
+from storage.storage_binary import StorageBinary, convert
+from storage.storage_jsonl import StorageJsonl, export_movies
+from storage.storage_sqlite import migrate
+
+MOVIES = [{"title": "Alpha", "rating": 7.0, "year": 1999, "poster_url": "", "imdbID": "tt1"},
+          {"title": "Beta", "rating": 8.0, "year": 2001, "poster_url": "", "imdbID": "tt2"}]
+
+
+def test_binary_catalogs_convert_to_every_format(tmp_path):
+    csv_path, bin_path = str(tmp_path / "movies.csv"), str(tmp_path / "movies.bin")
+    open_storage(csv_path).add_movies(MOVIES)
+    assert convert(csv_path, bin_path) == 2
+    assert isinstance(open_storage(bin_path), StorageBinary)
+    assert export_movies(bin_path, str(tmp_path / "movies.jsonl")) == 2
+    assert isinstance(open_storage(str(tmp_path / "movies.jsonl")), StorageJsonl)
+    assert migrate(bin_path, str(tmp_path / "movies.db")) == 2
+    assert sorted(title for title, _ in open_storage(str(tmp_path / "movies.db")).iter_movies()) == ["Alpha", "Beta"]
+
+
+def test_unknown_file_types_are_rejected(tmp_path, capsys):
+    path = tmp_path / "movies.txt"
+    path.write_text("Alpha")
+    with pytest.raises(ValueError, match="Unknown movie file type '.txt'"):
+        open_storage(str(path))
+    assert export_movies(str(path), str(tmp_path / "movies.jsonl")) == 0
+    assert convert(str(path), str(tmp_path / "movies.bin")) == 0
+    assert "Unknown movie file type" in capsys.readouterr().out
+    assert not (tmp_path / "movies.jsonl").exists()
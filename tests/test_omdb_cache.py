@@ -0,0 +1,64 @@
+import pytest
+import omdb_cache
+from omdb_cache import OmdbCache
+from omdb_client import OmdbClient, OmdbError
+
+FOUND = {"Title": "The Matrix", "imdbRating": "8.7", "Year": "1999", "Poster": "N/A", "imdbID": "tt0133093",
+         "Response": "True"}
+NOT_FOUND = {"Response": "False", "Error": "Movie not found!"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() for the cache."""
+    now = [1000.0]
+    monkeypatch.setattr(omdb_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = OmdbCache(str(tmp_path / "cache.db"), ttl=60)
+    cache.put({"i": "tt0133093"}, FOUND)
+    clock[0] += 59
+    assert cache.get({"i": "TT0133093 "}) == FOUND
+    clock[0] += 2
+    assert cache.get({"i": "tt0133093"}) is None
+
+
+def test_titles_are_looked_up_case_and_space_insensitively(tmp_path):
+    cache = OmdbCache(str(tmp_path / "cache.db"))
+    cache.put({"t": "The Matrix"}, FOUND)
+    assert cache.get({"t": "  the   MATRIX"}) == FOUND
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = OmdbCache(str(tmp_path / "cache.db"), max_entries=2)
+    for imdb_id in ("tt1", "tt2"):
+        cache.put({"i": imdb_id}, FOUND)
+        clock[0] += 1
+    cache.get({"i": "tt1"})  # tt2 is now the least recently used
+    clock[0] += 1
+    cache.put({"i": "tt3"}, FOUND)
+    assert [cache.get({"i": imdb_id}) is not None for imdb_id in ("tt1", "tt2", "tt3")] == [True, False, True]
+
+
+def test_not_found_answers_use_the_negative_ttl(tmp_path, clock):
+    cache = OmdbCache(str(tmp_path / "cache.db"), ttl=600, negative_ttl=60)
+    cache.put({"t": "No Such Movie"}, NOT_FOUND)
+    cache.put({"t": "Limited"}, {"Response": "False", "Error": "Request limit reached!"})
+    assert cache.get({"t": "No Such Movie"}) == NOT_FOUND
+    assert cache.get({"t": "Limited"}) is None  # Errors other than "not found" aren't cached
+    clock[0] += 61
+    assert cache.get({"t": "No Such Movie"}) is None
+
+
+def test_client_answers_from_the_cache(omdb_server, tmp_path):
+    omdb_server.add("tt0133093", "The Matrix")
+    client = OmdbClient("key", base_url=omdb_server.base_url, cache=OmdbCache(str(tmp_path / "cache.db")))
+    for _ in range(2):
+        assert client.fetch_movie("tt0133093")["title"] == "The Matrix"
+        with pytest.raises(OmdbError, match="Movie not found!"):
+            client.fetch_movie("No Such Movie")
+    assert len(omdb_server.requests) == 2
+    client.fetch_movie("tt0133093", use_cache=False)
+    assert len(omdb_server.requests) == 3
@@ -0,0 +1,73 @@
+import pytest
+import omdb_client
+from omdb_client import OmdbClient, OmdbError
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records the client's sleeps instead of waiting."""
+    calls = []
+    monkeypatch.setattr(omdb_client.time, "sleep", calls.append)
+    return calls
+
+
+def make_client(server, **options):
+    return OmdbClient("key", base_url=server.base_url, backoff=0.01, **options)
+
+
+def test_fetches_by_title_and_imdb_id(omdb_server):
+    omdb_server.add("tt0133093", "The Matrix", rating="8.7", year="1999")
+    client = make_client(omdb_server)
+    assert client.fetch_movie("The Matrix")["rating"] == 8.7
+    assert client.fetch_movie(" tt0133093 ")["year"] == 1999
+    assert omdb_server.requests == [{"apikey": "key", "t": "The Matrix"}, {"apikey": "key", "i": "tt0133093"}]
+
+
+def test_retries_server_errors(omdb_server, sleeps):
+    omdb_server.add("tt0133093", "The Matrix")
+    omdb_server.script = [(500, {}, "oops"), (503, {}, "oops")]
+    movie = make_client(omdb_server).fetch_movie("tt0133093")
+    assert movie["title"] == "The Matrix"
+    assert len(omdb_server.requests) == 3
+    assert sleeps == [0.01, 0.02]  # Exponential backoff
+
+
+def test_gives_up_after_max_retries(omdb_server, sleeps):
+    omdb_server.script = [(502, {}, "oops")] * 3
+    with pytest.raises(OmdbError, match="status 502"):
+        make_client(omdb_server, max_retries=2).fetch_movie("tt0133093")
+    assert len(omdb_server.requests) == 3
+
+
+def test_retry_after_pauses_every_request(omdb_server, sleeps):
+    omdb_server.add("tt0133093", "The Matrix")
+    omdb_server.script = [(429, {"Retry-After": "30"}, "slow down")]
+    client = make_client(omdb_server)
+    assert client.fetch_movie("tt0133093")["title"] == "The Matrix"
+    assert len(sleeps) == 1 and 29 < sleeps[0] <= 30
+    # The pause applies to the whole client, so the next request waits as well
+    client.fetch_movie("tt0133093")
+    assert len(sleeps) == 2 and 29 < sleeps[1] <= 30
+
+
+def test_request_limit_answer_pauses_and_retries(omdb_server, sleeps):
+    omdb_server.add("tt0133093", "The Matrix")
+    omdb_server.script = [(401, {}, {"Response": "False", "Error": "Request limit reached!"})]
+    assert make_client(omdb_server).fetch_movie("tt0133093")["title"] == "The Matrix"
+    assert len(omdb_server.requests) == 2
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 0.01
+
+
+def test_movie_not_found(omdb_server, sleeps):
+    with pytest.raises(OmdbError, match="Movie not found!"):
+        make_client(omdb_server).fetch_movie("No Such Movie")
+    assert len(omdb_server.requests) == 1  # Not retried
+    assert sleeps == []
+
+
+def test_fetch_movies_keeps_the_order_and_reports_errors(omdb_server):
+    omdb_server.add("tt0000001", "One")
+    omdb_server.add("tt0000002", "Two")
+    results = make_client(omdb_server, max_workers=4).fetch_movies(["tt0000002", "tt0000009", "tt0000001"])
+    assert [(query, movie and movie["title"], error) for query, movie, error in results] == [
+        ("tt0000002", "Two", None), ("tt0000009", None, "Movie not found!"), ("tt0000001", "One", None)]
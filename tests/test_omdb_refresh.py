@@ -0,0 +1,29 @@
+from omdb_cache import OmdbCache
+from omdb_client import OmdbClient
+from omdb_refresh import refresh_ratings
+from storage.storage_csv import StorageCsv
+
+
+def test_refresh_ratings_writes_changes_and_uses_the_cache(omdb_server, tmp_path):
+    omdb_server.add("tt0000001", "One", rating="8.0", year="2001")
+    omdb_server.add("tt0000002", "Two", rating="6.0", year="2002")
+    storage = StorageCsv(str(tmp_path / "movies.csv"))
+    storage.add_movies([
+        {"title": "One", "rating": 7.0, "year": 2001, "poster_url": "No poster available", "imdbID": "tt0000001"},
+        {"title": "Two", "rating": 6.0, "year": 2002, "poster_url": "No poster available", "imdbID": "tt0000002"},
+        {"title": "Gone", "rating": 5.0, "year": 2003, "poster_url": "", "imdbID": "tt0000009"},
+        {"title": "Local", "rating": 5.0, "year": 2004, "poster_url": "", "imdbID": ""},
+    ])
+    client = OmdbClient("key", base_url=omdb_server.base_url, cache=OmdbCache(str(tmp_path / "cache.db")))
+
+    report = refresh_ratings(storage, client, batch_size=2)
+    assert {name: report[name] for name in ("checked", "updated", "unchanged", "skipped", "errors")} == {
+        "checked": 3, "updated": 1, "unchanged": 1, "skipped": 1, "errors": 1}
+    assert float(dict(storage.iter_movies())["One"]["rating"]) == 8.0
+
+    # Fresh answers come from the cache, force=True asks OMDb again
+    requests = len(omdb_server.requests)
+    assert refresh_ratings(storage, client)["unchanged"] == 2
+    assert len(omdb_server.requests) == requests
+    refresh_ratings(storage, client, force=True)
+    assert len(omdb_server.requests) == requests + 3
@@ -0,0 +1,75 @@
+import io
+import json
+import os
+import pytest
+from PIL import Image
+from conftest import start_server, stop_server
+from poster_cache import INDEX_NAME, PosterCache
+
+
+def image_bytes(size, color, image_format="PNG"):
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, image_format)
+    return output.getvalue()
+
+
+@pytest.fixture
+def poster_server():
+    """Serves the files of a dictionary (path -> bytes) and counts the requests per path."""
+    files = {"/big.png": image_bytes((1000, 1500), "red"), "/red.jpg": image_bytes((100, 150), "red", "JPEG"),
+             "/same-red.jpg": image_bytes((100, 150), "red", "JPEG"), "/text": b"not an image"}
+    requests = {}
+
+    def answer(path):
+        requests[path] = requests.get(path, 0) + 1
+        if path not in files:
+            return 404, {}, b"Not found"
+        return 200, {"Content-Type": "application/octet-stream"}, files[path]
+
+    server, base_url = start_server(answer)
+    try:
+        yield base_url, requests
+    finally:
+        stop_server(server)
+
+
+def test_posters_are_resized_to_thumbnails(poster_server, tmp_path):
+    base_url, _ = poster_server
+    cache = PosterCache(str(tmp_path), size=(128, 193))
+    assert cache.fetch([base_url + "big.png", "No poster available"]) == (1, 0, 0)
+    path = cache.thumbnail(base_url + "big.png")
+    assert path.startswith("posters/") and path.endswith(".jpg")
+    with Image.open(tmp_path / os.path.basename(path)) as image:
+        assert image.format == "JPEG" and image.size == (128, 192)
+
+
+def test_cached_posters_are_skipped(poster_server, tmp_path):
+    base_url, requests = poster_server
+    urls = [base_url + "big.png", base_url + "red.jpg"]
+    assert PosterCache(str(tmp_path)).fetch(urls) == (2, 0, 0)
+    # A new cache (e.g. another process) reads index.json and downloads nothing again
+    cache = PosterCache(str(tmp_path))
+    assert cache.fetch(urls + urls) == (0, 2, 0)
+    assert requests == {"/big.png": 1, "/red.jpg": 1}
+    with open(tmp_path / INDEX_NAME, encoding="utf-8") as file:
+        assert set(json.load(file)) == set(urls)
+
+
+def test_identical_posters_share_one_file(poster_server, tmp_path):
+    base_url, _ = poster_server
+    cache = PosterCache(str(tmp_path))
+    assert cache.fetch([base_url + "red.jpg", base_url + "same-red.jpg"]) == (2, 0, 0)
+    assert cache.thumbnail(base_url + "red.jpg") == cache.thumbnail(base_url + "same-red.jpg")
+    assert len([name for name in os.listdir(tmp_path) if name != INDEX_NAME]) == 1
+
+
+def test_missing_posters_and_non_images_fail(poster_server, tmp_path):
+    base_url, requests = poster_server
+    cache = PosterCache(str(tmp_path))
+    urls = [base_url + "missing.jpg", base_url + "text", base_url + "red.jpg"]
+    assert cache.fetch(urls) == (1, 0, 2)
+    assert cache.thumbnail(base_url + "missing.jpg") is None
+    assert cache.thumbnail(base_url + "text") is None
+    # Failed posters are not retried by the same process
+    assert cache.fetch(urls) == (0, 1, 2)
+    assert requests["/missing.jpg"] == requests["/text"] == 1
@@ -0,0 +1,58 @@
+import pytest
+from storage.snapshot import SnapshotStore
+from storage.storage_csv import StorageCsv
+from storage.storage_sqlite import StorageSqlite
+
+MOVIES = [("Alpha", 7.0, 1999), ("Beta", 8.0, "N/A"), ("Gamma", 6.0, 2005), ("Delta", "N/A", 2010)]
+TIED = [("Zed", 7.0, 2001), ("Abe", 7.0, 2001), ("Mid", 7.0, 2001), ("Top", 9.0, 2001)]
+
+
+def make_storage(kind, directory, movies):
+    """Returns a storage of the kind ("csv", "sqlite" or a published "snapshot") holding the movies."""
+    storage = StorageSqlite(str(directory / "movies.db")) if kind == "sqlite" else StorageCsv(
+        str(directory / "movies.csv"))
+    storage.add_movies([{"title": title, "rating": rating, "year": year, "poster_url": "", "imdbID": f"tt{index}"}
+                        for index, (title, rating, year) in enumerate(movies)])
+    if kind == "snapshot":
+        store = SnapshotStore(str(directory / "snapshots"))
+        store.publish(storage)
+        return store.open_current()
+    return storage
+
+
+@pytest.fixture(params=["csv", "sqlite", "snapshot"])
+def kind(request):
+    return request.param
+
+
+@pytest.fixture
+def storage(kind, tmp_path):
+    return make_storage(kind, tmp_path, MOVIES)
+
+
+def titles(result):
+    total, page = result
+    return total, [title for title, _ in page]
+
+
+def test_year_ranges_leave_out_non_numeric_years(storage):
+    assert titles(storage.query_movies(year_from=2000)) == (2, ["Gamma", "Delta"])
+    assert titles(storage.query_movies(year_to=2005)) == (2, ["Alpha", "Gamma"])
+    assert titles(storage.query_movies(year_from=1990, sort="year", descending=True)) == (3, ["Delta", "Gamma", "Alpha"])
+
+
+def test_rating_filter_and_sort(storage):
+    assert titles(storage.query_movies(min_rating=6.5, sort="rating")) == (2, ["Alpha", "Beta"])
+    assert titles(storage.query_movies(sort="rating", descending=True)) == (4, ["Beta", "Alpha", "Gamma", "Delta"])
+
+
+def test_paging(storage):
+    assert titles(storage.query_movies(sort="title", offset=1, limit=2)) == (4, ["Beta", "Delta"])
+
+
+def test_ties_are_ordered_by_title(kind, tmp_path):
+    storage = make_storage(kind, tmp_path, TIED)
+    assert titles(storage.query_movies(sort="rating")) == (4, ["Abe", "Mid", "Zed", "Top"])
+    assert titles(storage.query_movies(sort="rating", descending=True)) == (4, ["Top", "Zed", "Mid", "Abe"])
+    assert titles(storage.query_movies(sort="year", min_rating=5)) == (4, ["Abe", "Mid", "Top", "Zed"])
+    assert titles(storage.query_movies(title="d", sort="rating", descending=True)) == (2, ["Zed", "Mid"])
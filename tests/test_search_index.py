@@ -0,0 +1,70 @@
+import pytest
+from storage.search_index import MAX_CANDIDATES, SearchIndex, typo_budget
+
+TITLES = ["The Matrix", "The Matrix Reloaded", "Inception", "Interstellar", "The Silent River", "Heat",
+          "The Dark Knight", "Silent Night"]
+
+
+def titles(results):
+    return [title for title, _ in results]
+
+
+def test_substitution_and_missing_letter():
+    index = SearchIndex(TITLES)
+    assert titles(index.search("matrx"))[0] == "The Matrix"
+    assert titles(index.search("the dark knigth"))[0] == "The Dark Knight"
+
+
+def test_transposition():
+    index = SearchIndex(TITLES)
+    assert titles(index.search("teh matrix"))[0] == "The Matrix"
+    assert titles(index.search("incpetion"))[0] == "Inception"
+
+
+@pytest.mark.parametrize("query, title", [
+    ("heet", "Heat"), ("alein", "Alien"), ("fsrgo", "Fargo"), ("frago", "Fargo"), ("psyhco", "Psycho"),
+    ("mmento", "Memento"),
+])
+def test_one_typo_in_a_short_title(query, title):
+    index = SearchIndex(TITLES + ["Alien", "Fargo", "Psycho", "Memento", "Aliens", "Platoon"])
+    assert titles(index.search(query))[0] == title
+
+
+def test_two_typos_in_a_longer_query():
+    index = SearchIndex(TITLES)
+    assert typo_budget("silnt rivr") == 2
+    assert titles(index.search("silnt rivr"))[0] == "The Silent River"
+
+
+def test_titles_containing_the_query_rank_first():
+    index = SearchIndex(TITLES)
+    assert titles(index.search("matrix")) == ["The Matrix", "The Matrix Reloaded"]
+    assert index.search("matrix")[0][1] > 0
+
+
+def test_unrelated_query_finds_nothing():
+    assert SearchIndex(TITLES).search("zzzzzz") == []
+
+
+def test_add_and_remove():
+    index = SearchIndex(TITLES)
+    index.add("Memento")
+    assert titles(index.search("memnto")) == ["Memento"]
+    index.remove("Memento")
+    assert index.search("memnto") == []
+    assert "Memento" not in index.autocomplete("mem")
+
+
+def test_autocomplete_matches_word_starts():
+    index = SearchIndex(TITLES)
+    assert index.autocomplete("sil") == ["Silent Night", "The Silent River"]
+    assert index.autocomplete("matrix re") == ["The Matrix Reloaded"]
+
+
+def test_common_words_score_a_bounded_number_of_candidates():
+    many = [f"The Golden Road {number}" for number in range(MAX_CANDIDATES * 100)]
+    index = SearchIndex(many + ["Golden"])
+    results = index.search("golden road", limit=5)
+    assert len(results) == 5
+    assert all("Golden Road" in title for title in titles(results))
+    assert results == index.search("golden road", limit=5)  # Repeatable despite the cap
@@ -0,0 +1,33 @@
+import pytest
+from storage import storage_file
+from storage.storage_csv import StorageCsv
+from storage.storage_json import StorageJson
+
+
+@pytest.fixture(params=[StorageCsv, StorageJson], ids=["csv", "json"])
+def storage(request, tmp_path):
+    storage = request.param(str(tmp_path / ("movies.csv" if request.param is StorageCsv else "movies.json")))
+    storage.add_movie("Alpha", 7.0, 1999, "", "tt1")
+    return storage
+
+
+def test_update_and_delete_report_success(storage):
+    assert storage.update_movie("Alpha", 8.0, "") is True
+    assert storage.delete_movie("Alpha") is True
+    assert storage.delete_movie("Alpha") is False
+    assert storage.update_movie("Alpha", 8.0, "") is False
+
+
+def test_failed_journal_writes_are_not_reported_as_success(storage, monkeypatch, capsys):
+    def failing_open(file, mode="r", *args, **kwargs):
+        if file == storage.journal_filename and "a" in mode:
+            raise OSError("No space left on device")
+        return open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(storage_file, "open", failing_open, raising=False)
+    capsys.readouterr()
+    assert storage.update_movie("Alpha", 8.0, "") is False
+    assert storage.delete_movie("Alpha") is False
+    output = capsys.readouterr().out
+    assert "Error writing to journal" in output
+    assert "successfully" not in output